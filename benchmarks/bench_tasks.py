@@ -0,0 +1,472 @@
+"""
+PT 自动任务端到端基准测试。
+
+启动本地模拟站点（见 fake_tracker.py），通过插件的 SiteRunner 执行真实的站点任务，
+完成台账、请求耗时采集、按域名学习的超时、Metrics 与历史写入均与插件运行时一致，
+输出总耗时、请求数、峰值内存与各阶段耗时，便于比较不同版本的性能。
+
+站点模块通过一个不执行插件 __init__.py 的合成包加载，因此无需 MoviePilot 运行环境；
+插件数据（台账、超时样本、历史）保存在内存中的 MemoryStore，读写时按 JSON 序列化以模拟数据库存储；
+请求由 LocalTransport 按（域名, cookie）转发到对应的模拟站点，异步站点的 httpx 请求经 local_async_transport 使用同一路由，
+插件代码本身不做任何修改。
+
+用法（在仓库根目录执行）：
+    python benchmarks/bench_tasks.py --sites 16 --tasks 3 --latency 0.05
+    python benchmarks/bench_tasks.py --error-rate 0.1 --page-rows 500 --json result.json
+
+--sites 大于站点模块数量时，同一站点模块会以不同账号（cookie）重复出现，每个账号对应独立的模拟站点。
+每次运行前默认清空完成台账，使所有任务都实际执行；--keep-ledger 保留台账，用于测量已完成任务的跳过开销。
+"""
+import argparse
+import base64
+import contextlib
+import importlib
+import io
+import inspect
+import itertools
+import json
+import logging
+import multiprocessing
+import pkgutil
+import resource
+import statistics
+import sys
+import threading
+import time
+import types
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from fake_tracker import TrackerOptions, serve  # noqa: E402
+
+PLUGIN_PATH = Path(__file__).resolve().parent.parent / "plugins" / "ptautotask"
+PACKAGE = "ptautotask"
+
+
+@dataclass
+class BenchSite:
+    module: str
+    name: str
+    domain: str
+    netloc: str
+    tasks_cls: type
+    cookie: str
+    tasks: list
+    address: str = ""
+    replica: int = 0
+
+    def as_support_site(self) -> dict:
+        """
+        转换为插件站点清单的格式；重复的账号使用带序号的域名，使台账、分组与指标按独立站点统计
+        """
+        return {
+            "name": self.name,
+            "domain": self.domain if not self.replica else f"{self.domain}#{self.replica}",
+            "cookie": self.cookie,
+            "tasks": [{**task, "module": f"sites.{self.module}", "class": self.tasks_cls.__name__}
+                      for task in self.tasks],
+        }
+
+
+@dataclass
+class TaskTiming:
+    site: str
+    task_id: str
+    seconds: float
+    failed: bool
+    status: str
+
+
+@dataclass
+class RunResult:
+    wall: float
+    phases: dict
+    requests: int
+    server_requests: dict
+    server_errors: int
+    failed: int
+    total: int
+    skipped: int
+    spans: int
+    store: dict
+    timings: list = field(default_factory=list)
+
+
+def load_plugin_package():
+    """
+    以合成包的方式加载插件目录，只导入 base / utils / sites，不执行插件 __init__.py
+    """
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [str(PLUGIN_PATH)]
+    sys.modules[PACKAGE] = package
+    return package
+
+
+def discover_sites() -> list:
+    """
+    导入全部站点模块，返回 [(模块名, 站点类, 任务类, 任务列表)]
+    """
+    sites = []
+    for module_info in pkgutil.iter_modules([str(PLUGIN_PATH / "sites")]):
+        try:
+            module = importlib.import_module(f"{PACKAGE}.sites.{module_info.name}")
+        except Exception as e:
+            print(f"跳过站点 {module_info.name}：导入失败 {e!r}", file=sys.stderr)
+            continue
+        client_cls = tasks_cls = None
+        for name, obj in inspect.getmembers(module, inspect.isclass):
+            if obj.__module__ != module.__name__:
+                continue
+            if name.lower() == "tasks":
+                tasks_cls = obj
+            else:
+                client_cls = obj
+        if not client_cls or not tasks_cls:
+            continue
+        tasks = tasks_cls.get_registered_tasks(client_name=client_cls.get_site_name())
+        if tasks:
+            sites.append((module_info.name, client_cls, tasks_cls, tasks))
+    return sites
+
+
+class LocalTransport:
+    """
+    包装插件的传输层，将请求按（域名, cookie）改写到对应的模拟站点，并统计请求数
+    """
+
+    def __init__(self, inner, routes: dict):
+        self.inner = inner
+        self.name = inner.name
+        self.routes = routes  # (netloc, cookie) -> 模拟站点地址
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def route(self, netloc: str, cookie: str = None) -> str:
+        """
+        返回（域名, cookie）对应的模拟站点地址并计数
+        """
+        address = self.routes.get((netloc, cookie)) or self.routes.get((netloc, None))
+        if address is None:
+            raise RuntimeError(f"未配置模拟站点: {netloc}")
+        with self._lock:
+            self.requests += 1
+        return address
+
+    def request(self, method, url, headers=None, params=None, data=None, timeout=None, stream=False):
+        parts = urlsplit(url)
+        headers = dict(headers or {})
+        cookie = next((value for key, value in headers.items() if key.lower() == "cookie"), None)
+        address = self.route(parts.netloc, cookie)
+        headers["Host"] = parts.netloc
+        local_url = urlunsplit(("http", address, parts.path, parts.query, parts.fragment))
+        return self.inner.request(method, local_url, headers=headers, params=params, data=data, timeout=timeout,
+                                  stream=stream)
+
+    def close(self):
+        self.inner.close()
+
+
+def local_async_transport(local: LocalTransport):
+    """
+    异步站点（AsyncNexusPHP）使用的 httpx 异步传输层，与 LocalTransport 共用路由与请求计数；
+    未安装 httpx 时异步请求在线程中使用同步传输层，返回 None
+    """
+    from ptautotask.utils.transport import httpx
+    if httpx is None:
+        return None
+
+    class LocalAsyncTransport(httpx.AsyncBaseTransport):
+        def __init__(self):
+            self.inner = httpx.AsyncHTTPTransport()
+
+        async def handle_async_request(self, request):
+            # Host 请求头在构造请求时已按原始域名设置，这里只改写连接地址
+            host, port = local.route(request.url.netloc.decode("ascii"), request.headers.get("cookie")).split(":")
+            request.url = request.url.copy_with(scheme="http", host=host, port=int(port))
+            return await self.inner.handle_async_request(request)
+
+        async def aclose(self):
+            await self.inner.aclose()
+
+    return LocalAsyncTransport()
+
+
+def scale_delays(generator, scale: float):
+    """
+    按比例缩短任务中 yield 的 Delay，其余行为与原生成器一致
+    """
+    from ptautotask.base.Delay import Delay
+    try:
+        step = next(generator)
+        while True:
+            yield Delay(step.seconds * scale) if isinstance(step, Delay) else step
+            step = next(generator)
+    except StopIteration as stop:
+        return stop.value
+
+
+class MemoryStore:
+    """
+    内存中的插件数据存储，接口与 _PluginBase 的 get_data / save_data / del_data 一致，并统计读写次数与写入字节数
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.stats = {"reads": 0, "writes": 0, "deletes": 0, "write_bytes": 0}
+        self._lock = threading.Lock()
+
+    def get_data(self, key):
+        with self._lock:
+            self.stats["reads"] += 1
+            raw = self.data.get(key)
+        return None if raw is None else json.loads(raw)
+
+    def save_data(self, key, value):
+        raw = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self.stats["writes"] += 1
+            self.stats["write_bytes"] += len(raw.encode("utf-8"))
+            self.data[key] = raw
+
+    def del_data(self, key):
+        with self._lock:
+            self.stats["deletes"] += 1
+            self.data.pop(key, None)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.stats)
+
+
+def bench_runner_cls():
+    """
+    返回按比例缩短 Delay 的 SiteRunner 子类，任务执行流程本身不做任何修改
+    """
+    from ptautotask.utils.site_runner import SiteRunner
+
+    class BenchSiteRunner(SiteRunner):
+        delay_scale = 1.0
+
+        def run_domain(self, sites, site_indexes, target_set=None):
+            return (yield from scale_delays(super().run_domain(sites, site_indexes, target_set), self.delay_scale))
+
+    return BenchSiteRunner
+
+
+def bench_cookie(replica: int) -> str:
+    """
+    每个账号使用不同的 cookie，c_secure_uid 与 NexusPHP 一致为 base64 编码的用户 id
+    """
+    uid = base64.b64encode(str(1001 + replica).encode("ascii")).decode("ascii")
+    return f"c_secure_uid={uid}; bench={replica}"
+
+
+def build_sites(discovered: list, site_count: int, task_count: int) -> list:
+    sites = []
+    for index, (module, client_cls, tasks_cls, tasks) in zip(range(site_count), itertools.cycle(discovered)):
+        replica = index // len(discovered)
+        selected = list(itertools.islice(itertools.cycle(tasks), task_count)) if task_count else list(tasks)
+        sites.append(BenchSite(module=module, name=f"{client_cls.get_site_name()}#{replica}",
+                               domain=client_cls.get_site_domain(), netloc=urlsplit(client_cls.get_url()).netloc,
+                               tasks_cls=tasks_cls, cookie=bench_cookie(replica), tasks=selected, replica=replica))
+    return sites
+
+
+def run_once(sites: list, args, conn, store: MemoryStore) -> RunResult:
+    from ptautotask.utils.async_requests import AsyncCustomRequests
+    from ptautotask.utils.custom_requests import CustomRequests
+    from ptautotask.utils.history_store import HistoryStore
+    from ptautotask.utils.ledger import CompletionLedger
+    from ptautotask.utils.metrics import Metrics
+    from ptautotask.utils.timeouts import AdaptiveTimeouts
+    from ptautotask.utils.transport import create_transport
+
+    phases = {}
+    routes = {(site.netloc, site.cookie): site.address for site in sites}
+    transport = LocalTransport(create_transport(args.transport), routes)
+    CustomRequests.transport = transport
+    AsyncCustomRequests.transport = local_async_transport(transport)
+    if not args.keep_ledger:
+        store.del_data(CompletionLedger.DATA_KEY)
+    conn.send("stats")
+    before = conn.recv()
+    store_before = store.snapshot()
+
+    # 与插件 __do_tasks 一致：载入超时样本，由 SiteRunner 执行全部站点，再保存超时样本与本次运行的历史
+    start = time.perf_counter()
+    CustomRequests.timeouts.load(store.get_data(AdaptiveTimeouts.DATA_KEY))
+    runner = bench_runner_cls()(CompletionLedger(store.get_data, store.save_data), lambda task_id: True,
+                                tz=datetime.now().astimezone().tzinfo, max_workers=args.workers)
+    runner.delay_scale = args.delay_scale
+    try:
+        # 部分站点模块会直接 print 调试信息，默认不输出以免影响结果展示
+        with contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO()):
+            results = runner.run([site.as_support_site() for site in sites])
+    finally:
+        phases["run"] = time.perf_counter() - start
+        close_start = time.perf_counter()
+        samples = CustomRequests.timeouts.dump()
+        if samples is not None:
+            store.save_data(key=AdaptiveTimeouts.DATA_KEY, value=samples)
+        CustomRequests.close()
+        phases["close"] = time.perf_counter() - close_start
+
+    history_start = time.perf_counter()
+    now = datetime.now().astimezone()
+    HistoryStore(store.get_data, store.save_data, store.del_data).append(
+        {"date": now.strftime('%Y-%m-%d %H:%M:%S'), "records": [rec for rec, _, _ in results]}, ts=int(now.timestamp()))
+    phases["history"] = time.perf_counter() - history_start
+    Metrics.observe_run(time.perf_counter() - start)
+
+    conn.send("stats")
+    after = conn.recv()
+    server_requests = {}
+    server_errors = 0
+    for stats_before, stats_after in zip(before, after):
+        for path, count in stats_after["requests"].items():
+            server_requests[path] = server_requests.get(path, 0) + count - stats_before["requests"].get(path, 0)
+        server_errors += sum(stats_after["errors"].values()) - sum(stats_before["errors"].values())
+    store_after = store.snapshot()
+    timings = [TaskTiming(rec["site"], rec["task_id"], rec["timing"]["total"] / 1000, failed, rec["status"])
+               for rec, _, failed in results]
+    return RunResult(wall=phases["run"], phases=phases, requests=transport.requests,
+                     server_requests=server_requests, server_errors=server_errors, failed=sum(1 for t in timings if t.failed),
+                     total=len(timings), skipped=sum(len(site.tasks) for site in sites) - len(timings),
+                     spans=sum(len(rec["timing"]["http"]) for rec, _, _ in results),
+                     store={key: store_after[key] - store_before[key] for key in store_after}, timings=timings)
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 下单位为 KB，macOS 下为字节
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize_tasks(timings: list) -> dict:
+    by_task = {}
+    for timing in timings:
+        by_task.setdefault(timing.task_id, []).append(timing)
+    summary = {}
+    for task_id, items in sorted(by_task.items()):
+        seconds = [item.seconds for item in items]
+        summary[task_id] = {
+            "count": len(items),
+            "failed": sum(1 for item in items if item.failed),
+            "p50": percentile(seconds, 50),
+            "p95": percentile(seconds, 95),
+            "max": max(seconds),
+        }
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="PT 自动任务端到端基准测试")
+    parser.add_argument("--sites", type=int, default=8, help="站点数量 N（超过站点模块数时以不同账号重复）")
+    parser.add_argument("--tasks", type=int, default=0, help="每个站点执行的任务数 M（0 表示全部已注册任务）")
+    parser.add_argument("--workers", type=int, default=4, help="SiteTaskRunner 并发站点数")
+    parser.add_argument("--repeat", type=int, default=3, help="重复运行次数")
+    parser.add_argument("--latency", type=float, default=0.02, help="模拟站点响应延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="响应延迟随机浮动（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟站点返回 500 的概率")
+    parser.add_argument("--page-rows", type=int, default=50, help="页面填充行数（页面大小）")
+    parser.add_argument("--reply-delay", type=float, default=0.5, help="喊话后出现回复的时间（秒）")
+    parser.add_argument("--crowd", type=int, default=1, help="每次喊话后其他用户紧接着发送的喊话数")
+    parser.add_argument("--delay-scale", type=float, default=0.1, help="任务中 Delay 的缩放比例")
+    parser.add_argument("--transport", default="requests", choices=["requests", "httpx", "auto"],
+                        help="插件使用的传输层")
+    parser.add_argument("--rate-limit", action="store_true", help="保留按域名的请求限速（默认关闭）")
+    parser.add_argument("--seed", type=int, default=1, help="模拟站点随机数种子")
+    parser.add_argument("--keep-ledger", action="store_true", help="多次运行之间保留完成台账（测量跳过已完成任务的开销）")
+    parser.add_argument("--json", dest="json_path", help="将结果写入 JSON 文件")
+    parser.add_argument("--verbose", action="store_true", help="显示站点模块自身的输出")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    phases = {}
+    # 任务日志默认不输出，失败情况见汇总
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+
+    start = time.perf_counter()
+    load_plugin_package()
+    from ptautotask.utils.config import Config
+    from ptautotask.utils.history_store import HistoryStore
+    from ptautotask.utils.timeouts import AdaptiveTimeouts
+    if not args.rate_limit:
+        Config.RATE_LIMIT_RATE = 0
+        Config.RATE_LIMIT_MIN_INTERVAL = 0
+    discovered = discover_sites()
+    if not discovered:
+        print("未找到可用的站点模块", file=sys.stderr)
+        return 1
+    sites = build_sites(discovered, args.sites, args.tasks)
+    phases["import"] = time.perf_counter() - start
+
+    # 模拟站点运行在子进程中，峰值内存只统计插件侧
+    start = time.perf_counter()
+    options = TrackerOptions(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                             page_rows=args.page_rows, reply_delay=args.reply_delay, crowd=args.crowd, seed=args.seed)
+    context = multiprocessing.get_context("spawn")
+    conn, child_conn = context.Pipe()
+    server = context.Process(target=serve, args=(len(sites), options, child_conn), daemon=True)
+    server.start()
+    for site, address in zip(sites, conn.recv()):
+        site.address = address
+    phases["servers"] = time.perf_counter() - start
+
+    runs = []
+    store = MemoryStore()
+    try:
+        for _ in range(max(1, args.repeat)):
+            runs.append(run_once(sites, args, conn, store))
+    finally:
+        conn.send("stop")
+        server.join(timeout=5)
+
+    walls = [run.wall for run in runs]
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key != "json_path"},
+        "sites": [{"name": site.name, "tasks": [task["id"] for task in site.tasks]} for site in sites],
+        "phases": phases,
+        "runs": [{key: value for key, value in asdict(run).items() if key != "timings"} for run in runs],
+        "wall": {"min": min(walls), "median": statistics.median(walls), "max": max(walls)},
+        "tasks": summarize_tasks([timing for run in runs for timing in run.timings]),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    print(f"站点 {len(sites)} 个，任务 {runs[0].total} 个，工作线程 {args.workers}，传输层 {args.transport}")
+    print(f"导入 {phases['import']:.3f}s  启动模拟站点 {phases['servers']:.3f}s")
+    for index, run in enumerate(runs, 1):
+        print(f"第 {index} 次: 耗时 {run.wall:.3f}s  关闭 {run.phases['close']:.3f}s  "
+              f"历史写入 {run.phases['history']:.3f}s  请求 {run.requests}（记录耗时 {run.spans}）  "
+              f"注入错误 {run.server_errors}  任务失败 {run.failed}/{run.total}  已完成跳过 {run.skipped}  "
+              f"数据写入 {run.store['writes']} 次 {run.store['write_bytes'] / 1024:.1f} KB")
+    print(f"耗时 min {report['wall']['min']:.3f}s  median {report['wall']['median']:.3f}s  "
+          f"max {report['wall']['max']:.3f}s  峰值内存 {report['peak_rss_mb']:.1f} MB")
+    timeouts = store.get_data(AdaptiveTimeouts.DATA_KEY) or {}
+    print(f"学习到的超时: {len(timeouts)} 个域名/接口  "
+          f"历史: {HistoryStore(store.get_data, store.save_data, store.del_data).count()} 次运行")
+    print("请求分布: " + ", ".join(f"{path} {count}" for path, count in sorted(runs[-1].server_requests.items())))
+    print(f"{'任务':<28}{'次数':>6}{'失败':>6}{'p50':>9}{'p95':>9}{'max':>9}")
+    for task_id, item in report["tasks"].items():
+        print(f"{task_id:<28}{item['count']:>6}{item['failed']:>6}"
+              f"{item['p50']:>9.3f}{item['p95']:>9.3f}{item['max']:>9.3f}")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""
+本地 NexusPHP 站点模拟服务，供基准测试使用。
+
+实现了站点模块会访问的页面与接口：
+attendance.php、shoutbox.php、ajax.php、messages.php、lottery.php、customgame.php，
+以及青蛙（bonus-shop）、织梦（drawMedalGroupReward）、朱雀（fireGenshinCharacterMagic）的 JSON 接口。
+
+每个模拟站点监听独立端口，可配置响应延迟、错误率与页面大小（行数）。
+喊话后经过 reply_delay 秒会出现机器人回复与一封新站内信，用于覆盖需要轮询结果的任务；
+每次喊话后其他用户会紧接着发送 crowd 条以机器人名称开头的喊话，用于覆盖喊话与回复的匹配。
+群聊区每行的发送者为 NexusPHP 格式的用户链接，本账号的用户 id 取自请求的 c_secure_uid cookie。
+"""
+import base64
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+BOT_UID = "1"  # 机器人（皮总）的用户 id
+PASSERBY_UID = "2"  # 其他用户的用户 id
+DEFAULT_UID = "1001"  # 请求未携带 c_secure_uid 时本账号的用户 id
+
+
+@dataclass
+class TrackerOptions:
+    latency: float = 0.02  # 每个请求的基础延迟（秒）
+    jitter: float = 0.0  # 延迟随机浮动（秒）
+    error_rate: float = 0.0  # 返回 500 的概率
+    page_rows: int = 50  # 群聊区、站内信、签到页的填充行数
+    reply_delay: float = 0.5  # 喊话后出现回复的时间（秒）
+    crowd: int = 1  # 每次喊话后其他用户紧接着发送的喊话数
+    seed: int = None
+
+
+class TrackerState:
+    """
+    单个模拟站点的状态：群聊区消息、站内信、签到次数与请求计数
+    """
+
+    def __init__(self, options: TrackerOptions):
+        self.options = options
+        self.lock = threading.Lock()
+        self.random = random.Random(options.seed)
+        now = time.time()
+        # (可见时间, 发送者 id, 发送者, 内容)，按时间顺序追加
+        self.shouts = [(now - i, PASSERBY_UID, "路人", f"历史消息 {i}") for i in range(options.page_rows, 0, -1)]
+        # (可见时间, id, 标题)
+        self.messages = [(now - i, str(i), f"历史站内信 {i}") for i in range(1, options.page_rows + 1)]
+        self.next_message_id = options.page_rows + 1
+        self.attendance_count = 0
+        self.requests = {}  # path -> 请求次数
+        self.errors = {}  # path -> 注入的错误次数
+
+    def count(self, path: str, error: bool = False):
+        with self.lock:
+            counter = self.errors if error else self.requests
+            counter[path] = counter.get(path, 0) + 1
+
+    def shout(self, text: str, uid: str):
+        now = time.time()
+        reply_at = now + self.options.reply_delay
+        with self.lock:
+            self.shouts.append((now, uid, "我", text))
+            # 其他用户紧接着的喊话同样以机器人名称开头，排在本账号的喊话之前（更新）
+            for i in range(self.options.crowd):
+                self.shouts.append((now, PASSERBY_UID, "路人甲", f"皮总，求魔力 {i + 1}"))
+            # 机器人以织梦的机器人名称回复，并引用喊话原文
+            self.shouts.append((reply_at, BOT_UID, "皮总", f"回复「{text}」：奖励已发放"))
+            self.messages.append((reply_at, str(self.next_message_id), f"喊话回复：{text}"))
+            self.next_message_id += 1
+
+    def visible_shouts(self) -> list:
+        now = time.time()
+        with self.lock:
+            return [item for item in reversed(self.shouts) if item[0] <= now][:self.options.page_rows]
+
+    def visible_messages(self) -> list:
+        now = time.time()
+        with self.lock:
+            return [item for item in reversed(self.messages) if item[0] <= now][:self.options.page_rows]
+
+
+def _html(body: str) -> bytes:
+    return f"<html><head><title>bench</title></head><body>{body}</body></html>".encode("utf-8")
+
+
+class TrackerHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 响应头与响应体分两次写出，关闭 Nagle 算法以免与延迟确认叠加出约 40ms 的额外等待
+    disable_nagle_algorithm = True
+    state: TrackerState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = "text/html; charset=utf-8", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != "HEAD" and body:
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # 客户端流式读取到需要的内容后会提前断开
+                self.close_connection = True
+
+    def _json(self, payload: dict):
+        self._send(200, json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json")
+
+    def _read_form(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode("utf-8", "replace") if length else ""
+        return {key: values[-1] for key, values in parse_qs(raw).items()}
+
+    def _handle(self):
+        options = self.state.options
+        parts = urlsplit(self.path)
+        path = parts.path
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        form = self._read_form() if self.command == "POST" else {}
+        self.state.count(path)
+
+        delay = options.latency + (self.state.random.uniform(0, options.jitter) if options.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        if options.error_rate and self.state.random.random() < options.error_rate:
+            self.state.count(path, error=True)
+            self._send(500, _html("<h1>500 Internal Server Error</h1>"))
+            return
+
+        route = ROUTES.get(path)
+        if route is None:
+            self._send(404, _html("<h1>404 Not Found</h1>"))
+            return
+        route(self, query, form)
+
+    do_GET = _handle
+    do_POST = _handle
+
+    # ---- 页面 ----
+
+    def attendance(self, query, form):
+        with self.state.lock:
+            self.state.attendance_count += 1
+            count = self.state.attendance_count
+        filler = "".join(f"<tr><td>签到说明第 {i} 行</td></tr>" for i in range(self.state.options.page_rows))
+        body = ("<table><tr><td><table><tr><td>"
+                f"<p>这是您的第 <b>{count}</b> 次签到，已连续签到 <b>{count}</b> 天。</p>"
+                f"</td></tr></table></td></tr></table><table>{filler}</table>")
+        self._send(200, _html(body))
+
+    def _uid(self) -> str:
+        cookie = SimpleCookie()
+        try:
+            cookie.load(self.headers.get("Cookie") or "")
+            return base64.b64decode(unquote(cookie["c_secure_uid"].value)).decode("ascii")
+        except Exception:
+            return DEFAULT_UID
+
+    def shoutbox(self, query, form):
+        text = query.get("shbox_text")
+        if text:
+            self.state.shout(text, self._uid())
+        rows = "".join(f"<tr><td><span class=\"date\">[{time.strftime('%H:%M', time.localtime(ts))}]</span> "
+                       f"<a href=\"userdetails.php?id={uid}\"><b>{sender}</b></a>: {content}</td></tr>"
+                       for ts, uid, sender, content in self.state.visible_shouts())
+        notice = "<ul><li>发送成功</li></ul>" if text else ""
+        self._send(200, _html(f"{notice}<table>{rows}</table>"))
+
+    def ajax(self, query, form):
+        if form.get("action") == "claimTask":
+            self._json({"ret": 0, "msg": f"任务 {form.get('params[exam_id]')} 领取成功"})
+        else:
+            self._json({"ret": -1, "msg": "未知操作"})
+
+    def messages(self, query, form):
+        if self.command == "POST":
+            self._send(200, _html("<p>操作成功</p>"))
+            return
+        rows = "".join(
+            f"<tr><td><img title=\"Unread\" /></td><td><a href=\"#\">{topic}</a></td><td>系统</td>"
+            f"<td><span>{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))}</span></td>"
+            f"<td><input type=\"checkbox\" value=\"{message_id}\" /></td></tr>"
+            for ts, message_id, topic in self.state.visible_messages())
+        body = _html("<form><table><tr><td>状态</td><td>主题</td><td>发信人</td><td>时间</td><td>操作</td></tr>"
+                     f"{rows}</table></form>")
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, b"", headers={"ETag": etag})
+            return
+        self._send(200, body, headers={"ETag": etag})
+
+    def lottery(self, query, form):
+        self._send(200, _html(f"<table><tr><td>恭喜获得 {self.state.random.randint(1, 500)} 魔力值</td></tr></table>"))
+
+    def customgame(self, query, form):
+        if self.command == "POST":
+            host = self.headers.get("Host", "localhost")
+            body = ("<p>[签到已得5, 补签卡: 1]</p><script>"
+                    f"window.location.href = 'https://{host}/customgame.php?action=战斗结果&id=1';</script>")
+            self._send(200, _html(body))
+            return
+        body = ("<input id=\"battleMsgInput\" value=\"1\" /><div id=\"battleResultStringLastShow\">"
+                "<div><span>第 1 回合</span> <span>造成 100 点伤害</span></div><div>战斗胜利</div></div>")
+        self._send(200, _html(body))
+
+    # ---- JSON 接口 ----
+
+    def bonus_shop(self, query, form):
+        self._json({"code": 0, "msg": f"兑换成功：商品 {form.get('id')} x {form.get('amount')}"})
+
+    def medal_reward(self, query, form):
+        self._json({"serverTime": int(time.time() * 1000), "success": True, "errorCode": 0, "errorMsg": "",
+                    "result": {"rewardAmount": 15000, "seedBonus": "818255.0"}})
+
+    def release_skill(self, query, form):
+        self._json({"status": 200, "data": {"bonus": 42}})
+
+
+ROUTES = {
+    "/attendance.php": TrackerHandler.attendance,
+    "/shoutbox.php": TrackerHandler.shoutbox,
+    "/ajax.php": TrackerHandler.ajax,
+    "/messages.php": TrackerHandler.messages,
+    "/lottery.php": TrackerHandler.lottery,
+    "/customgame.php": TrackerHandler.customgame,
+    "/api/bonus-shop/exchange": TrackerHandler.bonus_shop,
+    "/javaapi/user/drawMedalGroupReward": TrackerHandler.medal_reward,
+    "/api/gaming/fireGenshinCharacterMagic": TrackerHandler.release_skill,
+}
+
+
+class TrackerServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 流式读取的客户端会在读到需要的内容后直接断开连接，属于正常情况
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class FakeTracker:
+    """
+    一个模拟站点：独立端口、独立状态，在后台线程中运行
+    """
+
+    def __init__(self, options: TrackerOptions, host: str = "127.0.0.1"):
+        self.state = TrackerState(options)
+        handler = type("BoundTrackerHandler", (TrackerHandler,), {"state": self.state})
+        self.server = TrackerServer((host, 0), handler)
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def address(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def serve(count: int, options: TrackerOptions, conn):
+    """
+    子进程入口：启动 count 个模拟站点并通过 conn 返回地址；
+    收到 "stats" 时返回各站点的请求与错误计数，收到 "stop" 时退出
+    """
+    trackers = [FakeTracker(options).start() for _ in range(count)]
+    conn.send([tracker.address for tracker in trackers])
+    try:
+        while True:
+            command = conn.recv()
+            if command == "stats":
+                conn.send([{"requests": dict(tracker.state.requests), "errors": dict(tracker.state.errors)}
+                           for tracker in trackers])
+            elif command == "stop":
+                break
+    finally:
+        for tracker in trackers:
+            tracker.stop()
@@ -1,4 +1,5 @@
 import json
+import random
 import re
 import time
 from datetime import datetime, timedelta
@@ -6,6 +7,7 @@ from datetime import datetime, timedelta
 import pytz
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from fastapi.responses import PlainTextResponse
 
 from app.core.config import settings
 from app.plugins import _PluginBase
@@ -20,6 +22,15 @@ import pkgutil
 import inspect
 from pathlib import Path
 
+from .utils.custom_requests import CustomRequests
+from .utils.history_store import HistoryStore
+from .utils.ledger import CompletionLedger
+from .utils.manifest import SiteManifest
+from .utils.metrics import Metrics
+from .utils.site_runner import SiteRunner
+from .utils.timeouts import AdaptiveTimeouts
+from .utils.timing import percentile
+
 
 class PTAutoTask(_PluginBase):
     # 插件名称
@@ -48,12 +59,21 @@ class PTAutoTask(_PluginBase):
     _onlyonce = False
     _notify = False
     _history_days = None
-    # 重试相关
-    _retry_count = 0  # 最大重试次数
-    _current_retry = 0  # 当前重试次数
-    _retry_interval = 2  # 重试间隔(小时)
+    _history_page_size = 10  # 详情页每页展示的运行次数
+    _latency_trend_runs = 8  # 耗时走势展示的运行次数
+    _last_success_seed_runs = 50  # 首次恢复任务最近成功时间时查找的运行次数
+    # 重试相关：仅重试失败的（站点, 任务），每项独立计数并按指数退避安排
+    _retry_count = 0  # 每个任务的最大重试次数
+    _retry_interval = 2  # 首次重试间隔(小时)，之后每次翻倍
+    _retry_max_interval = 24  # 重试间隔上限(小时)
+    _retry_min_interval = 0.1  # 重试间隔下限(小时)
+    _retry_jitter = 0.2  # 重试间隔随机浮动比例，避免多个任务同时重试
+    _retry_busy_delay = 5  # 重试时已有任务在执行，顺延的分钟数
     # 代理相关
     _use_proxy = False  # 是否使用代理，默认启用
+    # 并发相关
+    _max_workers = 0  # 同时执行任务的站点数，0 表示按本次执行的站点数自动设置
+    _max_workers_limit = 16  # 同时执行任务的站点数上限
 
     # 定时器
     _scheduler: Optional[BackgroundScheduler] = None
@@ -64,12 +84,44 @@ class PTAutoTask(_PluginBase):
         self.filter_sites = None
         self.config_list = None
         self.config_group_by_domain = None
+        self._history_store = HistoryStore(self.get_data, self.save_data, self.del_data,
+                                           tz=pytz.timezone(settings.TZ))
+        self._ledger = CompletionLedger(self.get_data, self.save_data)
+        # 重试状态：{(域名, 任务id): 已重试次数}
+        self._retry_state: Dict[tuple, int] = {}
 
     def __init_load_sites(self):
         """
-        初始化插件支持站点
+        初始化插件支持站点：优先读取磁盘上的站点清单，源文件变化时重新扫描并更新清单
+        """
+        manifest = None
+        try:
+            manifest = SiteManifest(self.get_data_path() / "site_manifest.json", Path(__file__).parent)
+            sites_info = manifest.load()
+            if sites_info is not None:
+                logger.info(f"从站点清单加载 {len(sites_info)} 个站点")
+                return sites_info
+        except Exception as e:
+            logger.warning(f"读取站点清单失败，将重新扫描站点: {e}")
+
+        sites_info, failed_modules = self.__scan_sites()
+        if failed_modules:
+            # 清单只在源文件变化时失效，保存不完整的站点列表会一直缺少加载失败的站点
+            logger.warning(f"站点 {', '.join(failed_modules)} 加载失败，不保存站点清单，下次加载时重新扫描")
+        elif manifest is not None:
+            try:
+                manifest.save(sites_info)
+            except Exception as e:
+                logger.warning(f"保存站点清单失败: {e}")
+        return sites_info
+
+    def __scan_sites(self):
+        """
+        导入 sites 目录下的所有站点模块，收集站点与任务信息
+        :return: (站点信息列表, 加载失败的模块名列表)
         """
         sites_info = []
+        failed_modules = []
 
         # 确定 sites 文件夹路径（相对 ptautotask 模块）
         sites_path = Path(__file__).parent / "sites"
@@ -96,12 +148,15 @@ class PTAutoTask(_PluginBase):
 
                 site_name = client_cls.get_site_name() if hasattr(client_cls, "get_site_name") else module_info.name
                 site_url = client_cls.get_site_domain() if hasattr(client_cls, "get_site_domain") else ""
-                # 初始化 tasks
-                # 由于获取任务方法非静态，故需要实例化
-                tasks = tasks_cls(cookie=None)
-                task_list = tasks.get_registered_tasks() if hasattr(tasks, "get_registered_tasks") else []
-                # 释放 tasks 实例,防止占用过多内存
-                del tasks
+                # 任务在类定义时已注册，直接读取类级注册表，无需实例化
+                registered_tasks = tasks_cls.get_registered_tasks(client_name=site_name) \
+                    if hasattr(tasks_cls, "get_registered_tasks") else []
+                # 仅记录可序列化的任务信息，执行时再按模块路径导入
+                task_list = [{
+                    **task,
+                    "module": f"sites.{module_info.name}",
+                    "class": tasks_cls.__name__
+                } for task in registered_tasks]
                 sites_info.append({
                     "name": site_name,
                     "domain": site_url,
@@ -128,11 +183,13 @@ class PTAutoTask(_PluginBase):
                             raise ModuleNotFoundError(f"模块文件未找到: {module_info.name}")
                 except Exception as e:
                     logger.error(f"加载站点 {module_info.name} 失败: {e}")
+                    failed_modules.append(module_info.name)
                     continue
             except Exception as e:
                 logger.error(f"加载站点 {module_name} 失败: {e}")
+                failed_modules.append(module_info.name)
 
-        return sites_info
+        return sites_info, failed_modules
 
     def get_support_sites(self):
         """
@@ -147,10 +204,12 @@ class PTAutoTask(_PluginBase):
         过滤出已启用的站点
         """
         support_sites = self.get_support_sites()
+        # 一次查询取出所有已启用站点，按域名建立索引，避免逐个站点查询数据库
+        active_sites = {site.domain: site for site in SiteOper().list_active() or []}
         filter_sites = []
         for support_site in support_sites:
             domain = support_site.get("domain")
-            mp_site = SiteOper().get_by_domain(domain)
+            mp_site = active_sites.get(domain)
             if mp_site is not None and mp_site.is_active:
                 support_site.update({"cookie": mp_site.cookie})
                 filter_sites.append(support_site)
@@ -338,10 +397,25 @@ class PTAutoTask(_PluginBase):
             self._cron = config.get("cron", "30 9,21 * * *")
             self._onlyonce = config.get("onlyonce", False)
             self._history_days = config.get("history_days", 30)
+            try:
+                self._retry_count = max(int(config.get("retry_count") or 0), 0)
+                # 间隔为 0 或负数时重试会立即触发并连续执行，限制最小间隔
+                self._retry_interval = max(self._retry_min_interval, float(config.get("retry_interval") or 2))
+            except (TypeError, ValueError):
+                logger.warning("重试配置无效，使用默认值")
+                self._retry_count, self._retry_interval = 0, 2
+            try:
+                self._max_workers = min(max(int(config.get("max_workers") or 0), 0), self._max_workers_limit)
+            except (TypeError, ValueError):
+                logger.warning("并发站点数配置无效，按站点数自动设置")
+                self._max_workers = 0
             # 站点个性化配置属性
             for site_config in sites_configs:
                 setattr(self, site_config, config.get(site_config, None))
 
+        # 恢复各任务最近一次成功的时间，重启后指标仍可用于告警
+        self._seed_last_success()
+
         # 停止现有任务
         self.stop_service()
 
@@ -351,7 +425,8 @@ class PTAutoTask(_PluginBase):
         # 立即运行一次
         if self._onlyonce:
             logger.info(f"PT-Auto-Task服务启动，立即运行一次")
-            self._scheduler.add_job(func=self.__do_tasks, trigger='date',
+            # 手动运行不受完成台账限制，本周期内已完成的任务也会再次执行
+            self._scheduler.add_job(func=self.__do_tasks, trigger='date', kwargs={"force": True},
                                     run_date=datetime.now(tz=pytz.timezone(settings.TZ)) + timedelta(seconds=3),
                                     name="PT_Task")
             # 关闭一次性开关
@@ -363,6 +438,9 @@ class PTAutoTask(_PluginBase):
                 "enabled": self._enabled,
                 "notify": self._notify,
                 "history_days": self._history_days,
+                "retry_count": self._retry_count,
+                "retry_interval": self._retry_interval,
+                "max_workers": self._max_workers,
             }
             for site_config in sites_configs:
                 # 保留当前内存中该站点配置的值（之前已从 config 赋值）
@@ -391,193 +469,128 @@ class PTAutoTask(_PluginBase):
                 text=text
             )
 
-    def _schedule_retry(self, hours=None):
+    @staticmethod
+    def _retry_job_id(domain: str, task_id: str) -> str:
+        return f"PT_Task_Retry|{domain}|{task_id}"
+
+    def _add_retry_job(self, domain: str, task_id: str, run_date: datetime):
         """
-        安排重试任务
-        :param hours: 重试间隔小时数，如果不指定则使用配置的_retry_interval
+        添加仅执行单个（站点, 任务）的一次性重试任务，同一任务已有待执行的重试时替换
         """
-        pass
-
+        if not self._scheduler:
+            self._scheduler = BackgroundScheduler(timezone=settings.TZ)
+        if not self._scheduler.running:
+            self._scheduler.start()
+        self._scheduler.add_job(func=self.__do_tasks, trigger='date', run_date=run_date,
+                                id=self._retry_job_id(domain, task_id), name="PT_Task_Retry",
+                                kwargs={"targets": [(domain, task_id)]}, replace_existing=True)
 
-    def _schedule_retry(self, hours=None):
+    def _schedule_retry(self, domain: str, task_id: str, attempt: int) -> Optional[float]:
         """
-        安排重试任务：在当前 scheduler 中增加一次性任务以便稍后重试 __do_tasks
+        按任务独立的指数退避（带随机浮动）安排重试
+        :param attempt: 第几次重试，从 1 开始
+        :return: 重试间隔小时数，安排失败时返回 None
         """
         try:
-            interval = hours if hours is not None else self._retry_interval
+            interval = min(self._retry_interval * 2 ** (attempt - 1), self._retry_max_interval)
+            interval *= random.uniform(1 - self._retry_jitter, 1 + self._retry_jitter)
             run_date = datetime.now(tz=pytz.timezone(settings.TZ)) + timedelta(hours=interval)
-            if not self._scheduler:
-                self._scheduler = BackgroundScheduler(timezone=settings.TZ)
-                self._scheduler.start()
-            self._scheduler.add_job(func=self.__do_tasks, trigger='date', run_date=run_date, name="PT_Task_Retry")
-            logger.info(f"已安排重试任务，{interval} 小时后执行")
+            self._add_retry_job(domain, task_id, run_date)
+            logger.info(f"已安排 {domain} - {task_id} 第 {attempt} 次重试，{interval:.2f} 小时后执行")
+            return interval
         except Exception as e:
             logger.error(f"安排重试任务失败: {e}")
+            return None
+
+    def _cancel_retry(self, domain: str, task_id: str):
+        """
+        任务已成功时清除其重试状态与待执行的重试任务
+        """
+        self._retry_state.pop((domain, task_id), None)
+        if self._scheduler and self._scheduler.get_job(self._retry_job_id(domain, task_id)):
+            self._scheduler.remove_job(self._retry_job_id(domain, task_id))
+
+    def _update_retries(self, run_records: list, targeted: bool):
+        """
+        根据本次运行结果更新各任务的重试状态，并在失败记录中写入 retry 信息。
+        常规运行中的失败从第 1 次重试重新计数，重试运行中的失败在原次数上累加。
+        """
+        for rec in run_records:
+            key = (rec.get("domain") or "", rec.get("task_id"))
+            if not rec.get("failed"):
+                self._cancel_retry(*key)
+                continue
+            if not self._retry_count:
+                continue
+            attempt = (self._retry_state.get(key, 0) if targeted else 0) + 1
+            if attempt > self._retry_count:
+                self._retry_state.pop(key, None)
+                logger.info(f"{key[0]} - {key[1]} 已达到最大重试次数，不再安排重试")
+                continue
+            interval = self._schedule_retry(*key, attempt)
+            if interval is None:
+                continue
+            self._retry_state[key] = attempt
+            Metrics.observe_retry(*key)
+            rec["retry"] = {
+                "enabled": True,
+                "current": attempt,
+                "max": self._retry_count,
+                "interval": round(interval, 2)
+            }
 
-    def __do_tasks(self):
+    def __do_tasks(self, targets: Optional[List[tuple]] = None, force: bool = False):
         """
         站点周期任务执行（按 run 保存历史并合并通知）
         优化：抽取状态判断与单个任务执行逻辑，减少重复代码。
+        :param targets: 仅执行指定的 [(域名, 任务id)]，用于重试失败的任务；为空时执行全部已启用任务
+        :param force: 忽略完成台账，本周期内已完成的任务也会再次执行（“立即运行一次”）
         """
         if hasattr(self, '_auto_task_in') and self._auto_task_in:
+            if targets:
+                # 重试任务不丢弃，顺延到当前运行结束后再执行
+                run_date = datetime.now(tz=pytz.timezone(settings.TZ)) + timedelta(minutes=self._retry_busy_delay)
+                for domain, task_id in targets:
+                    self._add_retry_job(domain, task_id, run_date)
+                logger.info(f"已有周期任务在执行，重试顺延 {self._retry_busy_delay} 分钟")
+                return
             logger.info("已有周期任务在执行，跳过当前任务")
             return
 
         self._auto_task_in = True
+        run_started = time.perf_counter()
         try:
+            # 载入之前运行中学习到的各站点超时
+            CustomRequests.timeouts.load(self.get_data(AdaptiveTimeouts.DATA_KEY))
             filter_sites = self.get_filter_sites() or []
-            any_failure = False
+            target_set = {tuple(target) for target in targets} if targets else None
+            if target_set is not None:
+                filter_sites = [site for site in filter_sites
+                                if any(site.get("domain") == domain for domain, _ in target_set)]
+                logger.info(f"开始重试失败的任务: {', '.join(f'{d} - {t}' for d, t in sorted(target_set))}")
             run_records = []  # 本次运行的所有任务记录（list）
             _site_notify_map: Dict[str, List[str]] = {}  # 按站点分组的通知行
             _site_order: List[str] = []  # 保持站点顺序
-
-            def is_fail(status: Optional[str]) -> bool:
-                if not status:
-                    return False
-                st = status.lower()
-                return ("失败" in status) or ("异常" in status) or ("error" in st)
-
-            def convert_result_to_status(result) -> str:
-                if isinstance(result, str):
-                    return result
-                if isinstance(result, dict):
-                    return result.get("status") or result.get("message") or "执行完成"
-                if result is None:
-                    return "执行完成"
-                return repr(result)
-
-            def _run_single_task(support_site: dict, task: dict):
-                """
-                执行单个任务并返回 (record, notify_line, failed_bool)
-                若任务被跳过返回 (None, None, None)
-                """
-                site_name = support_site.get("name") or support_site.get("domain") or "未知站点"
-                domain = support_site.get("domain") or ""
-                cookie = support_site.get("cookie")
-                task_id = task.get("id")
-                if not task_id:
-                    logger.debug(f"任务无 id，跳过: {task}")
-                    return None, None, None
-
-                enabled = getattr(self, task_id, False)
-                if not enabled:
-                    logger.debug(f"任务 {task_id} 被配置为禁用，跳过")
-                    return None, None, None
-
-                func_obj = task.get("func")
-                if not func_obj:
-                    logger.warning(f"任务 {task_id} 未包含可执行函数，跳过")
-                    return None, None, None
-
-                # 获取方法名与所属类（若为绑定方法）
-                try:
-                    method_name = getattr(getattr(func_obj, "__func__", func_obj), "__name__", None)
-                except Exception:
-                    method_name = None
-
-                tasks_cls = None
-                try:
-                    if hasattr(func_obj, "__self__") and func_obj.__self__ is not None:
-                        tasks_cls = func_obj.__self__.__class__
-                except Exception:
-                    tasks_cls = None
-
-                if not method_name:
-                    logger.warning(f"无法确定 {task_id} 的方法名，跳过")
-                    return None, None, None
-
-                now_str = datetime.now(tz=pytz.timezone(settings.TZ)).strftime('%Y-%m-%d %H:%M:%S')
-
-                try:
-                    # 执行任务
-                    result = None
-                    if tasks_cls:
-                        # 尝试用 cookie 构造新实例
-                        try:
-                            new_instance = tasks_cls(cookie=cookie)
-                        except TypeError:
-                            new_instance = tasks_cls()
-                            if cookie is not None:
-                                setattr(new_instance, "cookie", cookie)
-                        method = getattr(new_instance, method_name, None)
-                        if not method:
-                            raise RuntimeError(f"在新实例中未找到方法 {method_name}")
-                        logger.info(f"开始执行任务 {task_id}（站点: {site_name}）")
-                        result = method()
-                    else:
-                        logger.info(f"使用原绑定方法执行任务 {task_id}（站点: {site_name}，可能无 cookie）")
-                        result = func_obj()
-
-                    status_text = convert_result_to_status(result)
-
-                    record = {
-                        "date": now_str,
-                        "site": site_name,
-                        "domain": domain,
-                        "task_id": task_id,
-                        "task_label": task.get("label"),
-                        "status": status_text,
-                    }
-
-                    failed = is_fail(status_text)
-                    emoji = "❌" if failed else "✅"
-                    line = f"{emoji} {task.get('label') or task_id}: {status_text}"
-
-                    if failed:
-                        logger.warning(f"{site_name} - {task_id} 返回失败: {status_text}")
-                    else:
-                        logger.info(f"{site_name} - {task_id} 执行成功: {status_text}")
-
-                    return record, line, failed
-
-                except Exception as e:
-                    # 捕获执行期异常，构造失败记录
-                    logger.error(f"{site_name} - {task.get('id')} 异常: {e}", exc_info=True)
-                    err_status = f"执行失败: {str(e)}"
-                    record = {
-                        "date": now_str,
-                        "site": site_name,
-                        "domain": domain,
-                        "task_id": task.get("id"),
-                        "task_label": task.get("label"),
-                        "status": err_status,
-                    }
-                    line = f"❌ {task.get('label') or task.get('id')}: {err_status}"
-                    return record, line, True
-
-            # 主循环：对每个站点与任务调用 _run_single_task，统一处理返回
-            for support_site in filter_sites:
-                for task in support_site.get("tasks") or []:
-                    rec, line, failed = _run_single_task(support_site, task)
-                    if rec is None:
-                        continue
-                    run_records.append(rec)
-                    site_name = rec.get("site") or rec.get("domain") or "未知站点"
-                    if site_name not in _site_order:
-                        _site_order.append(site_name)
-                    _site_notify_map.setdefault(site_name, []).append(line)
-                    if failed:
-                        any_failure = True
-
-            # 根据失败与配置判断是否安排重试，并在需要时更新失败记录的 retry 信息
-            if any_failure and self._retry_count and self._retry_count > 0:
-                self._current_retry = min(self._current_retry + 1, self._retry_count)
-                if self._current_retry <= self._retry_count:
-                    logger.info(f"检测到执行失败，安排第 {self._current_retry} 次重试")
-                    for rec in run_records:
-                        st = rec.get("status", "")
-                        if is_fail(st):
-                            rec["retry"] = {
-                                "enabled": True,
-                                "current": self._current_retry,
-                                "max": self._retry_count,
-                                "interval": self._retry_interval
-                            }
-                    self._schedule_retry()
-                else:
-                    logger.info("已达到最大重试次数，不再安排重试")
-            else:
-                self._current_retry = 0
+            site_runner = SiteRunner(self._ledger, lambda task_id: getattr(self, task_id, False),
+                                     tz=pytz.timezone(settings.TZ), max_workers=self._get_max_workers(filter_sites),
+                                     logger=logger,
+                                     force=force)
+            try:
+                results = site_runner.run(filter_sites, target_set=target_set)
+            finally:
+                self._save_timeouts()
+
+            # 按站点顺序分组通知行
+            for rec, line, failed in results:
+                run_records.append(rec)
+                site_name = rec.get("site") or rec.get("domain") or "未知站点"
+                if site_name not in _site_order:
+                    _site_order.append(site_name)
+                _site_notify_map.setdefault(site_name, []).append(line)
+
+            # 仅为失败的任务安排重试，并在失败记录中写入 retry 信息
+            self._update_retries(run_records, targeted=target_set is not None)
+            self._save_last_success()
 
             # 保存本次运行为一个 list（each run is a list of records）
             try:
@@ -607,34 +620,76 @@ class PTAutoTask(_PluginBase):
                     logger.error(f"发送合并通知失败: {e}")
 
         finally:
+            Metrics.observe_run(time.perf_counter() - run_started)
             self._auto_task_in = False
 
+    def _get_max_workers(self, filter_sites: list) -> int:
+        """
+        本次运行同时执行任务的站点数：未配置时与站点（域名）数相同，使总耗时接近最慢的单个站点
+        """
+        if self._max_workers:
+            return self._max_workers
+        domains = {site.get("domain") or "" for site in filter_sites}
+        return min(max(len(domains), 1), self._max_workers_limit)
+
+    def _seed_last_success(self):
+        """
+        从插件数据恢复各任务最近一次成功的时间；尚未保存过时（如刚升级）从最近的运行历史中查找
+        """
+        try:
+            data = self.get_data(Metrics.LAST_SUCCESS_KEY)
+            if data is None:
+                data = {}
+                tz = pytz.timezone(settings.TZ)
+                for run in self._history_store.list_runs(limit=self._last_success_seed_runs):
+                    try:
+                        ts = tz.localize(datetime.strptime(run.get("date"), '%Y-%m-%d %H:%M:%S')).timestamp()
+                    except (TypeError, ValueError):
+                        continue
+                    for record in run.get("records") or []:
+                        if record.get("domain") and not HistoryStore.is_failed(record):
+                            data.setdefault(f"{record['domain']}|{record.get('task_id')}", ts)
+            Metrics.seed_last_success(data)
+        except Exception as e:
+            logger.error(f"恢复任务最近成功时间失败: {e}")
+
+    def _save_last_success(self):
+        try:
+            self.save_data(key=Metrics.LAST_SUCCESS_KEY, value=Metrics.last_success())
+        except Exception as e:
+            logger.error(f"保存任务最近成功时间失败: {e}")
+
+    def _save_timeouts(self):
+        """
+        保存本次运行中新增的超时样本
+        """
+        try:
+            samples = CustomRequests.timeouts.dump()
+            if samples is not None:
+                self.save_data(key=AdaptiveTimeouts.DATA_KEY, value=samples)
+        except Exception as e:
+            logger.error(f"保存站点超时数据失败: {e}")
+
     def _save_history_run(self, run_records: list):
         """
-        将一次运行（run_records: list）追加到 history 中。
-        history 的结构为 list，每项为 {'date': '...', 'records': [...]}
+        将一次运行（run_records: list）作为独立的历史分段追加保存。
+        每个分段的结构为 {'date': '...', 'records': [...]}
         """
-        history = self.get_data('history') or []
-        now_str = datetime.now(tz=pytz.timezone(settings.TZ)).strftime('%Y-%m-%d %H:%M:%S')
+        now = datetime.now(tz=pytz.timezone(settings.TZ))
         run_entry = {
-            "date": now_str,
+            "date": now.strftime('%Y-%m-%d %H:%M:%S'),
             "records": run_records
         }
+        self._history_store.append(run_entry, ts=int(now.timestamp()))
 
-        history.append(run_entry)
-
-        # 保留指定天数的记录（按 run 的日期判断）
+        # 保留指定天数的记录（按 run 的时间戳整段删除）
         if self._history_days:
             try:
                 cutoff = time.time() - int(self._history_days) * 24 * 60 * 60
-                history = [h for h in history if
-                           datetime.strptime(h["date"], '%Y-%m-%d %H:%M:%S').timestamp() >= cutoff]
+                self._history_store.prune(cutoff)
             except Exception as e:
                 logger.error(f"清理历史记录异常: {e}")
 
-        self.save_data(key="history", value=history)
-
-
     def get_state(self) -> bool:
         return self._enabled
 
@@ -643,7 +698,56 @@ class PTAutoTask(_PluginBase):
         pass
 
     def get_api(self) -> List[Dict[str, Any]]:
-        pass
+        return [
+            {
+                "path": "/history",
+                "endpoint": self.get_history,
+                "methods": ["GET"],
+                "auth": "bear",
+                "summary": "分页获取执行历史",
+                "description": "按时间倒序分页返回运行记录，详情页“加载更早记录”按钮使用"
+            },
+            {
+                "path": "/metrics",
+                "endpoint": self.get_metrics,
+                "methods": ["GET"],
+                "summary": "运行指标",
+                "description": "Prometheus 文本格式的运行指标：运行耗时、任务成功/失败次数、HTTP 请求数与延迟、重试次数、"
+                               "距上次成功的秒数"
+            }
+        ]
+
+    @staticmethod
+    def _parse_page_args(page, page_size, default_page_size: int) -> Tuple[int, int]:
+        """
+        解析分页参数，非数字时抛出 ValueError
+        """
+        return max(1, int(page or 1)), max(1, int(page_size or default_page_size))
+
+    def get_history(self, page: int = 1, page_size: int = None) -> Dict[str, Any]:
+        """
+        分页获取执行历史（API，使用登录令牌认证），只读取数据
+        """
+        try:
+            page, page_size = self._parse_page_args(page, page_size, self._history_page_size)
+        except (TypeError, ValueError):
+            return {"success": False, "message": "分页参数无效"}
+        return {
+            "success": True,
+            "page": page,
+            "page_size": page_size,
+            "total": self._history_store.count(),
+            "runs": self._history_store.list_runs(offset=(page - 1) * page_size, limit=page_size)
+        }
+
+    @staticmethod
+    def get_metrics(apikey: str = None):
+        """
+        导出运行指标（API），指标在执行过程中累加，此处仅做格式化
+        """
+        if apikey != settings.API_TOKEN:
+            return {"success": False, "message": "API密钥错误"}
+        return PlainTextResponse(Metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
     def get_service(self) -> List[Dict[str, Any]]:
         """
@@ -805,6 +909,70 @@ class PTAutoTask(_PluginBase):
                                                 ]
                                             }
                                         ]
+                                    },
+                                    {
+                                        'component': 'VRow',
+                                        'content': [
+                                            {
+                                                'component': 'VCol',
+                                                'props': {
+                                                    'cols': 12,
+                                                    'md': 6
+                                                },
+                                                'content': [
+                                                    {
+                                                        'component': 'VTextField',
+                                                        'props': {
+                                                            'model': 'retry_count',
+                                                            'label': '失败重试次数',
+                                                            'placeholder': '0',
+                                                            'hint': '每个失败任务单独重试的最大次数，0 为不重试'
+                                                        }
+                                                    }
+                                                ]
+                                            },
+                                            {
+                                                'component': 'VCol',
+                                                'props': {
+                                                    'cols': 12,
+                                                    'md': 6
+                                                },
+                                                'content': [
+                                                    {
+                                                        'component': 'VTextField',
+                                                        'props': {
+                                                            'model': 'retry_interval',
+                                                            'label': '重试间隔(小时)',
+                                                            'placeholder': '2',
+                                                            'hint': '首次重试间隔，之后每次翻倍，最小 0.1 小时'
+                                                        }
+                                                    }
+                                                ]
+                                            }
+                                        ]
+                                    },
+                                    {
+                                        'component': 'VRow',
+                                        'content': [
+                                            {
+                                                'component': 'VCol',
+                                                'props': {
+                                                    'cols': 12,
+                                                    'md': 6
+                                                },
+                                                'content': [
+                                                    {
+                                                        'component': 'VTextField',
+                                                        'props': {
+                                                            'model': 'max_workers',
+                                                            'label': '并发站点数',
+                                                            'placeholder': '0',
+                                                            'hint': f'同时执行任务的站点数，0 为按启用的站点数自动设置，最大 {self._max_workers_limit}'
+                                                        }
+                                                    }
+                                                ]
+                                            }
+                                        ]
                                     }
                                 ]
                             }
@@ -993,6 +1161,9 @@ class PTAutoTask(_PluginBase):
             "cron": "30 9,21 * * *",
             "onlyonce": False,
             "history_days": 30,
+            "retry_count": 0,
+            "retry_interval": 2,
+            "max_workers": 0,
             # # 站点-Car
             # "car_claim": True,
             # # 站点-QingWa
@@ -1001,6 +1172,215 @@ class PTAutoTask(_PluginBase):
             **{k: True for k in self.get_config_list()}
         }
 
+    def _build_history_panel(self, run: dict) -> dict:
+        """
+        构造单次运行的历史展开面板
+        """
+        is_fail = HistoryStore.is_failed
+        run_date = run.get("date", "")
+        records = run.get("records", []) or []
+        # 计算本次运行的启用/成功/失败（启用按当前配置判定）
+        run_enabled = sum(1 for r in records if getattr(self, r.get("task_id"), False))
+        run_success = sum(1 for r in records if not is_fail(r))
+        run_fail = len(records) - run_success
+
+        # 按站点分组
+        sites_map: Dict[str, List[dict]] = {}
+        site_order: List[str] = []
+        for r in records:
+            site = r.get("site") or r.get("domain") or "未知站点"
+            if site not in site_order:
+                site_order.append(site)
+            sites_map.setdefault(site, []).append(r)
+
+        # 构造每个站点的详情节点（simple list）
+        site_blocks = []
+        for site in site_order:
+            recs = sites_map.get(site, [])
+            # site header
+            site_block = {
+                'component': 'VCard',
+                'props': {'variant': 'outlined', 'class': 'mb-2'},
+                'content': [
+                    {
+                        'component': 'VCardTitle',
+                        'props': {'class': 'd-flex align-center'},
+                        'content': [
+                            {'component': 'VIcon', 'props': {'class': 'mr-2'}, 'text': 'mdi-bell-ring'},
+                            {'component': 'span', 'text': site},
+                            {'component': 'VSpacer'},
+                            {
+                                'component': 'VChip',
+                                'props': {'size': 'small', 'variant': 'elevated'},
+                                'text': f'任务数: {len(recs)}'
+                            }
+                        ]
+                    },
+                    {'component': 'VDivider'},
+                    {
+                        'component': 'VCardText',
+                        'content': [
+                            {
+                                'component': 'VList',
+                                'props': {'dense': True},
+                                'content': [
+                                    {
+                                        'component': 'VListItem',
+                                        'content': [
+                                            {
+                                                'component': 'div',
+                                                'props': {'class': 'ml-0'},
+                                                'content': [
+                                                    {
+                                                        'component': 'div',
+                                                        'text': f"{'✅' if not is_fail(r) else '❌'}  {r.get('task_label') or r.get('task_id')}: {r.get('status', '')}"
+                                                    }
+                                                ] + self._build_timing_line(r.get('timing'))
+                                            }
+                                        ]
+                                    } for r in recs
+                                ]
+                            }
+                        ]
+                    }
+                ]
+            }
+            site_blocks.append(site_block)
+
+        # 面板标题（简洁汇总）
+        panel_title = {
+            'component': 'div',
+            'props': {'class': 'd-flex align-center'},
+            'content': [
+                {'component': 'span', 'text': run_date, 'props': {'class': 'mr-4'}},
+                {
+                    'component': 'VChip',
+                    'props': {'size': 'small', 'variant': 'elevated', 'class': 'ma-1'},
+                    'text': f'启用: {run_enabled}'
+                },
+                {
+                    'component': 'VChip',
+                    'props': {'size': 'small', 'variant': 'elevated', 'color': 'success', 'class': 'ma-1'},
+                    'text': f'成功: {run_success}'
+                },
+                {
+                    'component': 'VChip',
+                    'props': {'size': 'small', 'variant': 'elevated', 'color': 'error', 'class': 'ma-1'},
+                    'text': f'失败: {run_fail}'
+                }
+            ]
+        }
+
+        return {
+            'component': 'VExpansionPanel',
+            'props': {},
+            'content': [
+                {
+                    'component': 'VExpansionPanelTitle',
+                    'content': [panel_title]
+                },
+                {
+                    'component': 'VExpansionPanelText',
+                    'content': site_blocks or [
+                        {'component': 'div', 'text': '无详细记录'}
+                    ]
+                }
+            ]
+        }
+
+    @staticmethod
+    def _build_timing_line(timing: Optional[dict]) -> List[dict]:
+        """
+        任务记录下方的耗时说明，旧记录没有耗时信息时不显示
+        """
+        if not timing:
+            return []
+        spans = timing.get("http") or []
+        text = f"耗时 {timing.get('total', 0):.0f} ms · 请求 {len(spans)} 次"
+        if spans:
+            parts = [("连接", "connect"), ("首字节", "ttfb"), ("下载", "download"), ("解析", "parse")]
+            text += " · " + " / ".join(f"{label} {sum(span[field] for span in spans):.0f}" for label, field in parts)
+        return [{'component': 'div', 'props': {'class': 'text-caption text-medium-emphasis'}, 'text': text}]
+
+    @staticmethod
+    def _run_site_spans(run: dict) -> Dict[str, List[dict]]:
+        """
+        按站点汇总一次运行中的请求耗时 span
+        """
+        site_spans: Dict[str, List[dict]] = {}
+        for record in run.get("records") or []:
+            spans = (record.get("timing") or {}).get("http") or []
+            if spans:
+                site = record.get("site") or record.get("domain") or "未知站点"
+                site_spans.setdefault(site, []).extend(spans)
+        return site_spans
+
+    def _build_latency_card(self, runs: List[dict]) -> Optional[dict]:
+        """
+        按站点展示请求耗时：最近一次运行各阶段的中位数，以及最近若干次运行中每次运行的 p50/p95 走势
+        :param runs: 运行记录，最新的在前
+        """
+        # 由旧到新排列，便于从左到右查看走势
+        run_spans = [self._run_site_spans(run) for run in reversed(runs[:self._latency_trend_runs])]
+        sites = list(dict.fromkeys(site for spans in run_spans for site in spans))
+        if not sites:
+            return None
+
+        def trend(site: str, pct: int) -> str:
+            values = [f"{percentile([span['total'] for span in spans[site]], pct):.0f}"
+                      for spans in run_spans if spans.get(site)]
+            return " → ".join(values)
+
+        fields = ["connect", "ttfb", "download", "parse", "total"]
+        headers = ["站点", "最近请求数", "连接", "首字节", "下载", "解析", "最近总耗时", "p50 走势", "p95 走势"]
+        rows = []
+        for site in sites:
+            spans = run_spans[-1].get(site, [])
+            latest_cells = [f"{percentile([span[field] for span in spans], 50):.0f}" if spans else "-"
+                            for field in fields]
+            cells = [site, str(len(spans))] + latest_cells + [trend(site, 50), trend(site, 95)]
+            rows.append({'component': 'tr', 'content': [{'component': 'td', 'text': cell} for cell in cells]})
+
+        return {
+            'component': 'VCard',
+            'props': {'variant': 'outlined', 'class': 'mb-4'},
+            'content': [
+                {
+                    'component': 'VCardTitle',
+                    'props': {'class': 'd-flex align-center'},
+                    'content': [
+                        {'component': 'VIcon', 'props': {'class': 'mr-2'}, 'text': 'mdi-timer-outline'},
+                        {'component': 'span', 'text': '站点请求耗时（毫秒）'},
+                        {'component': 'VSpacer'},
+                        {
+                            'component': 'span',
+                            'props': {'class': 'text-caption'},
+                            'text': f'阶段耗时为最近一次运行的中位数，p50/p95 为最近 {len(run_spans)} 次运行中每次运行的请求耗时（由旧到新）'
+                        }
+                    ]
+                },
+                {'component': 'VDivider'},
+                {
+                    'component': 'VCardText',
+                    'content': [
+                        {
+                            'component': 'VTable',
+                            'props': {'hover': True, 'density': 'compact'},
+                            'content': [
+                                {
+                                    'component': 'thead',
+                                    'content': [{'component': 'tr', 'content': [
+                                        {'component': 'th', 'text': header} for header in headers
+                                    ]}]
+                                },
+                                {'component': 'tbody', 'content': rows}
+                            ]
+                        }
+                    ]
+                }
+            ]
+        }
+
     # python
     def get_page(self) -> List[dict]:
         """
@@ -1017,35 +1397,17 @@ class PTAutoTask(_PluginBase):
                 if getattr(self, t.get("id"), False):
                     enabled_tasks += 1
 
-        history = self.get_data('history') or []
-        # 按时间倒序
-        history = sorted(history, key=lambda x: x.get("date", ""), reverse=True)
-
-        # 统计最近一次执行与累计成功/失败
-        def is_fail(status: str) -> bool:
-            if not status:
-                return False
-            st = status.lower()
-            return ("失败" in status) or ("异常" in status) or ("error" in st)
-
-        total_success = 0
-        total_fail = 0
-        for run in history:
-            for r in run.get("records", []):
-                if is_fail(r.get("status", "")):
-                    total_fail += 1
-                else:
-                    total_success += 1
-
-        last_run_success = 0
-        last_run_fail = 0
-        if history:
-            last = history[0]
-            for r in last.get("records", []):
-                if is_fail(r.get("status", "")):
-                    last_run_fail += 1
-                else:
-                    last_run_success += 1
+        # 按时间倒序，详情页只渲染第一页
+        history = self._history_store.list_runs(limit=self._history_page_size)
+
+        # 统计最近一次执行与累计成功/失败（均为运行时增量维护的计数，无需遍历历史）
+        stats = self._history_store.stats()
+        total_success = stats["total"]["success"]
+        total_fail = stats["total"]["fail"]
+
+        latest_run = self._history_store.latest() or {}
+        last_run_success = latest_run.get("success", 0)
+        last_run_fail = latest_run.get("fail", 0)
 
         # 顶部统计卡片
         header_card = {
@@ -1090,7 +1452,7 @@ class PTAutoTask(_PluginBase):
                                         {
                                             'component': 'div',
                                             'props': {'class': 'text-subtitle-1'},
-                                            'text': f'最近一次（{history[0]["date"] if history else "无记录"}）: 成功 {last_run_success} / 失败 {last_run_fail}'
+                                            'text': f'最近一次（{latest_run.get("date") or "无记录"}）: 成功 {last_run_success} / 失败 {last_run_fail}'
                                         }
                                     ]
                                 },
@@ -1112,7 +1474,7 @@ class PTAutoTask(_PluginBase):
                                         {
                                             'component': 'div',
                                             'props': {'class': 'text-subtitle-1'},
-                                            'text': f'重试配置: {self._retry_count or 0} 次, 间隔 {self._retry_interval} 小时'
+                                            'text': f'重试配置: 每个任务最多 {self._retry_count or 0} 次, 首次间隔 {self._retry_interval} 小时（指数退避）'
                                         }
                                     ]
                                 }
@@ -1123,116 +1485,26 @@ class PTAutoTask(_PluginBase):
             ]
         }
 
-        # 历史面板：每个 run 一个展开项
-        panels = []
-        for run in history:
-            run_date = run.get("date", "")
-            records = run.get("records", []) or []
-            # 计算本次运行的启用/成功/失败（启用按当前配置判定）
-            run_enabled = sum(1 for r in records if getattr(self, r.get("task_id"), False))
-            run_success = sum(1 for r in records if not is_fail(r.get("status", "")))
-            run_fail = len(records) - run_success
-
-            # 按站点分组
-            sites_map: Dict[str, List[dict]] = {}
-            site_order: List[str] = []
-            for r in records:
-                site = r.get("site") or r.get("domain") or "未知站点"
-                if site not in site_order:
-                    site_order.append(site)
-                sites_map.setdefault(site, []).append(r)
-
-            # 构造每个站点的详情节点（simple list）
-            site_blocks = []
-            for site in site_order:
-                recs = sites_map.get(site, [])
-                # site header
-                site_block = {
-                    'component': 'VCard',
-                    'props': {'variant': 'outlined', 'class': 'mb-2'},
-                    'content': [
-                        {
-                            'component': 'VCardTitle',
-                            'props': {'class': 'd-flex align-center'},
-                            'content': [
-                                {'component': 'VIcon', 'props': {'class': 'mr-2'}, 'text': 'mdi-bell-ring'},
-                                {'component': 'span', 'text': site},
-                                {'component': 'VSpacer'},
-                                {
-                                    'component': 'VChip',
-                                    'props': {'size': 'small', 'variant': 'elevated'},
-                                    'text': f'任务数: {len(recs)}'
-                                }
-                            ]
-                        },
-                        {'component': 'VDivider'},
-                        {
-                            'component': 'VCardText',
-                            'content': [
-                                {
-                                    'component': 'VList',
-                                    'props': {'dense': True},
-                                    'content': [
-                                        {
-                                            'component': 'VListItem',
-                                            'content': [
-                                                {
-                                                    'component': 'div',
-                                                    'props': {'class': 'ml-0'},
-                                                    'content': [
-                                                        {
-                                                            'component': 'div',
-                                                            'text': f"{'✅' if not is_fail(r.get('status', '')) else '❌'}  {r.get('task_label') or r.get('task_id')}: {r.get('status', '')}"
-                                                        }
-                                                    ]
-                                                }
-                                            ]
-                                        } for r in recs
-                                    ]
-                                }
-                            ]
-                        }
-                    ]
-                }
-                site_blocks.append(site_block)
-
-            # 面板标题（简洁汇总）
-            panel_title = {
+        # 历史面板：仅渲染最新一页运行，更早的记录通过“加载更早记录”按钮从只读的分页接口读取
+        panels = [self._build_history_panel(run) for run in history]
+        total_runs = self._history_store.count()
+        load_more = []
+        if total_runs > len(history):
+            load_more.append({
                 'component': 'div',
-                'props': {'class': 'd-flex align-center'},
+                'props': {'class': 'd-flex justify-center mt-3'},
                 'content': [
-                    {'component': 'span', 'text': run_date, 'props': {'class': 'mr-4'}},
                     {
-                        'component': 'VChip',
-                        'props': {'size': 'small', 'variant': 'elevated', 'class': 'ma-1'},
-                        'text': f'启用: {run_enabled}'
-                    },
-                    {
-                        'component': 'VChip',
-                        'props': {'size': 'small', 'variant': 'elevated', 'color': 'success', 'class': 'ma-1'},
-                        'text': f'成功: {run_success}'
-                    },
-                    {
-                        'component': 'VChip',
-                        'props': {'size': 'small', 'variant': 'elevated', 'color': 'error', 'class': 'ma-1'},
-                        'text': f'失败: {run_fail}'
-                    }
-                ]
-            }
-
-            panels.append({
-                'component': 'VExpansionPanel',
-                'props': {},
-                'content': [
-                    {
-                        'component': 'VExpansionPanelTitle',
-                        'content': [panel_title]
-                    },
-                    {
-                        'component': 'VExpansionPanelText',
-                        'content': site_blocks or [
-                            {'component': 'div', 'text': '无详细记录'}
-                        ]
+                        'component': 'VBtn',
+                        'props': {'variant': 'tonal', 'color': 'primary', 'prepend-icon': 'mdi-chevron-down'},
+                        'text': f'加载更早记录（已显示 {len(history)} / {total_runs}）',
+                        'events': {
+                            'click': {
+                                'api': f'plugin/{self.__class__.__name__}/history',
+                                'method': 'get',
+                                'params': {'page': 2, 'page_size': self._history_page_size}
+                            }
+                        }
                     }
                 ]
             })
@@ -1248,7 +1520,7 @@ class PTAutoTask(_PluginBase):
                         {'component': 'VIcon', 'props': {'class': 'mr-2'}, 'text': 'mdi-history'},
                         {'component': 'span', 'text': '执行历史记录'},
                         {'component': 'VSpacer'},
-                        {'component': 'span', 'text': f'共 {len(history)} 次运行'}
+                        {'component': 'span', 'text': f'共 {total_runs} 次运行'}
                     ]
                 },
                 {'component': 'VDivider'},
@@ -1262,14 +1534,18 @@ class PTAutoTask(_PluginBase):
                                 {'component': 'div', 'text': '暂无历史记录'}
                             ]
                         }
-                    ]
+                    ] + load_more
                 }
             ]
         }
 
+        latency_card = self._build_latency_card(history)
+
         # 结果页面组合
         components = []
         components.append(header_card)
+        if latency_card:
+            components.append(latency_card)
         components.append(history_section)
 
         # 若有用户信息或其他保持原有逻辑（简化：保留前面用户信息卡片逻辑）
@@ -1301,5 +1577,9 @@ class PTAutoTask(_PluginBase):
                 if self._scheduler.running:
                     self._scheduler.shutdown()
                 self._scheduler = None
+            # 待执行的重试任务已随调度器清除
+            self._retry_state.clear()
+            # 关闭按域名复用的 HTTP 会话
+            CustomRequests.close()
         except Exception as e:
             logger.error("退出插件失败：%s" % str(e))
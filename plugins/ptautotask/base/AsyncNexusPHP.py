@@ -0,0 +1,88 @@
+import asyncio
+
+from .NexusPHP import NexusPHP
+from ..utils.async_requests import AsyncCustomRequests
+
+
+class AsyncNexusPHP(NexusPHP):
+    """
+    NexusPHP 的异步版本，方法签名与同步版本一致但均为协程，需在 async 任务中 await 调用。
+    默认解析方法与同步版本共用。
+    流式读取（stream_pages 与 get_messagebox 的 limit）与 HttpxTransport 一致交由 requests 传输层，
+    在线程中执行同步版本的对应方法，不阻塞事件循环。
+    """
+
+    """
+    发送群聊区消息
+    """
+
+    async def send_messagebox(self, message: str, rt_method: callable = None) -> str:
+        if rt_method is None and self.stream_pages:
+            return await asyncio.to_thread(NexusPHP.send_messagebox, self, message)
+        if rt_method is None:
+            rt_method = self._parse_send_messagebox
+        response = await AsyncCustomRequests.get(self.url_shoutbox, headers=self.headers, encoding=self.encoding,
+                                                 params=self._shoutbox_params(message))
+        return rt_method(response)
+
+    """
+    获取群聊区消息
+    """
+
+    async def get_messagebox(self, rt_method: callable = None, limit: int = None) -> list:
+        """
+        :param limit: 仅需要前 limit 条消息时传入，读取到足够的消息后即停止下载
+        """
+        if rt_method is None and limit:
+            return await asyncio.to_thread(NexusPHP.get_messagebox, self, limit=limit)
+        if rt_method is None:
+            rt_method = self._parse_messagebox
+        response = await AsyncCustomRequests.get(self.url_shoutbox, headers=self.headers, encoding=self.encoding)
+        return rt_method(response)
+
+    """
+    申领任务
+    """
+
+    async def claim_task(self, task_id: str, rt_method: callable) -> str:
+        response = await AsyncCustomRequests.post(self.url_ajax, headers=self.headers, encoding=self.encoding,
+                                                  data=self._claim_task_data(task_id))
+        return rt_method(response)
+
+    """
+    每日签到
+    """
+
+    async def attendance(self, rt_method: callable = None):
+        if rt_method is None and self.stream_pages:
+            return await asyncio.to_thread(NexusPHP.attendance, self)
+        if rt_method is None:
+            rt_method = self._parse_attendance
+        response = await AsyncCustomRequests.get(self.attendance_url, headers=self.headers, encoding=self.encoding)
+        return rt_method(response)
+
+    """
+    获取邮件列表
+    """
+
+    async def get_message_list(self, rt_method: callable = None):
+        if rt_method is None:
+            rt_method = self._parse_message_list
+        response = await AsyncCustomRequests.get(self.messages_url, headers=self.headers, encoding=self.encoding)
+        return rt_method(response)
+
+    """
+    将邮件设为已读
+    """
+
+    async def set_message_read(self, message_id: str, rt_method: callable = lambda response: ""):
+        response = await AsyncCustomRequests.post(self.messages_url, headers=self.headers, encoding=self.encoding,
+                                                  data=self._set_message_read_data(message_id))
+        return rt_method(response)
+
+    """
+    抽奖
+    """
+
+    async def lottery(self, parameter: tuple = None, rt_method: callable = None):
+        pass
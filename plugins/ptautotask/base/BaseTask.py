@@ -3,62 +3,68 @@ import inspect
 from pathlib import Path
 
 class BaseTask:
+    """
+    站点任务基类。任务方法既可以是普通方法，也可以是 async def 协程方法（配合 AsyncNexusPHP 使用），
+    协程任务会在本次运行共享的事件循环中执行。
+    """
+    # 类级任务注册表，在子类定义时生成：((定义类, 方法名, 元数据), ...)
+    _task_registry = ()
+    # 任务 id 前缀，使用子类文件名（小写）
+    _task_prefix = ""
+
     def __init__(self, client):
         self.client = client
 
-    @task_info(label="{client_name}签到", hint="执行{client_name}站点的签到任务")
+    def __init_subclass__(cls, **kwargs):
+        """子类定义时注册任务：仅包含子类实际定义/重写的方法（若子类未定义则忽略父类的方法）。
+        若子类重写了方法但未重新装饰，会回退到父类查找 _task_meta。
+        """
+        super().__init_subclass__(**kwargs)
+        registry = []
+        for name, func in sorted(cls.__dict__.items()):
+            if not inspect.isfunction(func):
+                continue
+            # 先尝试当前函数自身的元数据，再回退到 MRO 中父类定义的同名函数
+            meta = getattr(func, "_task_meta", None) or cls._find_task_meta(name)
+            if meta:
+                registry.append((cls, name, meta))
+        cls._task_registry = tuple(registry)
+
+        # 前缀使用子类文件名（小写），优先通过文件路径获取，失败回退到模块名
+        try:
+            cls._task_prefix = Path(inspect.getfile(cls)).stem.lower()
+        except (TypeError, OSError):
+            cls._task_prefix = getattr(cls, "__module__", "").split(".")[-1].lower()
+
+    @task_info(label="{client_name}签到", hint="执行{client_name}站点的签到任务", period="daily")
     def daily_checkin(self):
         return self.client.attendance()
 
-    @task_info(label="{client_name}喊话", hint="执行{client_name}站点的喊话任务")
+    @task_info(label="{client_name}喊话", hint="执行{client_name}站点的喊话任务", period="daily")
     def daily_shotbox(self):
         pass
 
-    def _find_task_meta(self, name):
+    @classmethod
+    def _find_task_meta(cls, name):
         """在类的 MRO 中查找首个定义了 _task_meta 的同名函数并返回其 meta"""
-        for base in self.__class__.__mro__:
+        for base in cls.__mro__:
             func = base.__dict__.get(name)
             if func and hasattr(func, "_task_meta"):
                 return getattr(func, "_task_meta")
         return None
 
-
-    def get_registered_tasks(self):
-        """收集当前实例所有注册的任务：仅包含子类实际定义/重写的方法（若子类未定义则忽略父类的方法）。
-        若子类重写了方法但未重新装饰，会回退到父类查找 _task_meta。
+    @classmethod
+    def get_registered_tasks(cls, client_name: str = "未知"):
+        """根据类级注册表返回任务列表，无需实例化任务类。
+        :param client_name: 站点名称，用于渲染 label/hint 模板
         """
         tasks = []
-        for name, method in inspect.getmembers(self.__class__, predicate=inspect.isfunction):
-            # 仅处理在子类中实际定义/重写的方法
-            if name not in self.__class__.__dict__:
-                continue
-
-            # 先尝试当前函数自身的元数据
-            meta = getattr(method, "_task_meta", None)
-            if meta is None:
-                # 回退：在 MRO 中查找父类定义的同名函数的元数据（允许子类实现但不重新装饰）
-                meta = self._find_task_meta(name)
-
-            if not meta:
-                continue
-
-            # 前缀使用子类文件名（小写），优先通过文件路径获取，失败回退到模块名
-            try:
-                prefix = Path(inspect.getfile(self.__class__)).stem.lower()
-            except (TypeError, OSError):
-                prefix = getattr(self.__class__, "__module__", "").split(".")[-1].lower()
-
-            task_id = f"{prefix}_{name}"
-
-            # 渲染 label/hint
-            label = meta["label_template"].format(client_name=getattr(self.client, "name_cn", "未知"))
-            hint = meta["hint_template"].format(client_name=getattr(self.client, "name_cn", "未知"))
-
+        for _, name, meta in cls._task_registry:
             tasks.append({
-                "id": task_id,
-                "label": label,
-                "hint": hint,
-                "func": getattr(self, name)  # 绑定实例方法
+                "id": f"{cls._task_prefix}_{name}",
+                "label": meta["label_template"].format(client_name=client_name),
+                "hint": meta["hint_template"].format(client_name=client_name),
+                "method": name,
+                "period": meta.get("period", "daily")
             })
         return tasks
-
@@ -1,8 +1,13 @@
-def task_info(label: str = None, hint: str = None):
+def task_info(label: str = None, hint: str = None, *, period):
+    """
+    :param period: 任务周期（必须声明），同一周期内成功执行后不再重复执行。
+                   "daily" 每天、"weekly" 每周、整数 N 表示当天每 N 小时一个时间窗、None 表示每次运行都执行
+    """
     def decorator(func):
         func._task_meta = {
             "label_template": label or func.__name__,
-            "hint_template": hint or f"执行 {func.__name__} 任务"
+            "hint_template": hint or f"执行 {func.__name__} 任务",
+            "period": period
         }
         return func
     return decorator
\ No newline at end of file
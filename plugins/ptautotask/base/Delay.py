@@ -0,0 +1,12 @@
+class Delay:
+    """
+    任务中的延迟步骤。任务方法写成生成器并 yield Delay(秒数)，
+    执行器会在指定时间后继续执行该任务，等待期间不占用工作线程，其他站点的任务可以继续执行。
+    任务最终 return 的值作为执行结果记录。
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = max(0.0, float(seconds))
+
+    def __repr__(self):
+        return f"Delay({self.seconds})"
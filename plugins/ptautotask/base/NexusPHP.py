@@ -1,4 +1,8 @@
+import time
+
+from .Delay import Delay
 from ..utils.custom_requests import CustomRequests
+from ..utils.content_filter import ContentFilter, XPATH_NODE_TEXT
 from lxml import etree
 
 
@@ -6,6 +10,16 @@ class NexusPHP:
     url = ""
     name_cn = ""
     domain = ""
+    # 站点页面编码，响应头未声明 charset 时使用，避免对页面做字符集探测
+    encoding = "utf-8"
+    # 请求频率限制（按域名生效）：每秒请求数、可连续发送的请求数、两次请求的最小间隔（秒），None 表示使用默认值
+    request_rate = None
+    request_burst = None
+    request_min_interval = None
+    # 为 True 时 send_messagebox / attendance 的默认解析改为流式读取（使用 STREAM_* 选择器，找到目标元素即停止），
+    # 仅适用于结果位于页面开头的站点；默认读取整页并使用 XPATH_* 选择器
+    stream_pages = False
+
     def __init__(self, cookie: str, url_shoutbox: str = None, url_ajax: str = None, attendance_url: str = None,
                  messages_url: str = None):
         self.url = self.get_url()
@@ -16,6 +30,8 @@ class NexusPHP:
         self.attendance_url = attendance_url or self.url + "/attendance.php"
         self.messages_url = messages_url or self.url + "/messages.php"
         self.cookie = cookie
+        CustomRequests.rate_limiter.configure(self.url, rate=self.request_rate, burst=self.request_burst,
+                                              min_interval=self.request_min_interval)
         self.headers = {
             "cookie": self.cookie,
             "referer": self.url,
@@ -35,31 +51,114 @@ class NexusPHP:
         raise NotImplementedError("Subclasses should implement this method to return the Domain.")
 
     """
-    发送群聊区消息
+    默认的响应解析方法，同步与异步客户端共用。
+    XPath 均在类定义时预编译，子类可通过覆盖同名类属性声明自己的选择器
     """
+    XPATH_SHOUTBOX_FIRST_ROW = etree.XPath("//tr[1]/td//text()")
+    XPATH_SHOUTBOX_CELLS = etree.XPath("//tr/td")
+    XPATH_ATTENDANCE = etree.XPath("//td/table//tr/td/p//text()")
+    XPATH_MESSAGE_ROWS = etree.XPath("//form/table//tr")
+    XPATH_MESSAGE_FIELDS = {
+        "status": etree.XPath("./td[1]/img/@title"),
+        "topic": etree.XPath("./td[2]//text()"),
+        "from": etree.XPath("./td[3]/text()"),
+        "time": etree.XPath("./td[4]//text()"),
+        "id": etree.XPath("./td[5]/input/@value")
+    }
 
-    def send_messagebox(self, message: str, rt_method: callable = None) -> str:
-        if rt_method is None:
-            rt_method = lambda response: " ".join(
-                etree.HTML(response.text).xpath("//tr[1]/td//text()"))
-        params = {
+    """
+    流式读取使用的目标元素：(标签名, 以元素为上下文的匹配条件)，子类可覆盖
+    只需要页面开头少量内容时，找到目标元素即断开连接，不再下载与解析整页。
+    send_messagebox / attendance 仅在 stream_pages 为 True 时使用，需与对应的 XPATH_* 选择器保持一致
+    """
+    STREAM_SHOUTBOX_ROW = ("tr", etree.XPath("boolean(./td)"))
+    STREAM_SHOUTBOX_CELL = ("td", etree.XPath("boolean(parent::tr)"))
+    STREAM_ATTENDANCE = ("p", etree.XPath("boolean(parent::td/parent::tr/ancestor::table/parent::td)"))
+    XPATH_ROW_CELL_TEXT = etree.XPath("./td//text()")
+
+    @classmethod
+    def _parse_send_messagebox(cls, response) -> str:
+        return " ".join(cls.XPATH_SHOUTBOX_FIRST_ROW(ContentFilter.lxml_get_HTML(response)))
+
+    @classmethod
+    def _parse_messagebox(cls, response) -> list:
+        return ["".join(XPATH_NODE_TEXT(item)) for item in cls.XPATH_SHOUTBOX_CELLS(ContentFilter.lxml_get_HTML(response))]
+
+    @classmethod
+    def _parse_attendance(cls, response) -> str:
+        return "".join(cls.XPATH_ATTENDANCE(ContentFilter.lxml_get_HTML(response)))
+
+    @classmethod
+    def _parse_message_list(cls, response) -> list:
+        return [{field: "".join(xpath(item)) for field, xpath in cls.XPATH_MESSAGE_FIELDS.items()}
+                for item in cls.XPATH_MESSAGE_ROWS(ContentFilter.lxml_get_HTML(response))]
+
+    @staticmethod
+    def _shoutbox_params(message: str) -> dict:
+        return {
             "shbox_text": message,
             "shout": "%E6%88%91%E5%96%8A",
             "sent": "yes",
             "type": "shoutbox"
         }
-        response = CustomRequests.get(self.url_shoutbox, headers=self.headers, params=params)
+
+    @staticmethod
+    def _claim_task_data(task_id: str) -> dict:
+        return {
+            "action": "claimTask",
+            "params[exam_id]": task_id
+        }
+
+    @staticmethod
+    def _set_message_read_data(message_id: str) -> dict:
+        return {
+            "action": "moveordel",
+            "messages[]": message_id,
+            "markread": "设为已读",
+            "box": "1"
+        }
+
+    """
+    发送群聊区消息
+    """
+
+    def send_messagebox(self, message: str, rt_method: callable = None) -> str:
+        if rt_method is None and self.stream_pages:
+            # 只取群聊区第一行（最新消息），流式读取到该行即停止
+            response = CustomRequests.get(self.url_shoutbox, headers=self.headers, encoding=self.encoding,
+                                          params=self._shoutbox_params(message), stream=True)
+            row = ContentFilter.lxml_stream_first(response, *self.STREAM_SHOUTBOX_ROW)
+            return " ".join(self.XPATH_ROW_CELL_TEXT(row)) if row is not None else ""
+        if rt_method is None:
+            rt_method = self._parse_send_messagebox
+        response = CustomRequests.get(self.url_shoutbox, headers=self.headers, encoding=self.encoding,
+                                      params=self._shoutbox_params(message))
         return rt_method(response)
 
     """
     获取群聊区消息
     """
 
-    def get_messagebox(self, rt_method: callable = None) -> list:
+    def get_messagebox(self, rt_method: callable = None, limit: int = None) -> list:
+        """
+        :param limit: 仅需要前 limit 条消息时传入，读取到足够的消息后即停止下载
+        """
+        if rt_method is None and limit:
+            response = CustomRequests.get(self.url_shoutbox, headers=self.headers, encoding=self.encoding,
+                                          stream=True)
+            messages = []
+            cells = ContentFilter.lxml_iter_stream(response, *self.STREAM_SHOUTBOX_CELL)
+            try:
+                for cell in cells:
+                    messages.append("".join(XPATH_NODE_TEXT(cell)))
+                    if len(messages) >= limit:
+                        break
+            finally:
+                cells.close()
+            return messages
         if rt_method is None:
-            rt_method = lambda response: ["".join(item.xpath(".//text()")) for item in
-                                          etree.HTML(response.text).xpath("//tr/td")]
-        response = CustomRequests.get(self.url_shoutbox, headers=self.headers)
+            rt_method = self._parse_messagebox
+        response = CustomRequests.get(self.url_shoutbox, headers=self.headers, encoding=self.encoding, cache=True)
         return rt_method(response)
 
     """
@@ -67,12 +166,8 @@ class NexusPHP:
     """
 
     def claim_task(self, task_id: str, rt_method: callable) -> str:
-        data = {
-            "action": "claimTask",
-            "params[exam_id]": task_id
-        }
-
-        response = CustomRequests.post(self.url_ajax, headers=self.headers, data=data)
+        response = CustomRequests.post(self.url_ajax, headers=self.headers, encoding=self.encoding,
+                                       data=self._claim_task_data(task_id))
         return rt_method(response)
 
     """
@@ -80,9 +175,15 @@ class NexusPHP:
     """
 
     def attendance(self, rt_method: callable = None):
+        if rt_method is None and self.stream_pages:
+            # 只取签到结果所在的段落，流式读取到该段落即停止
+            response = CustomRequests.get(self.attendance_url, headers=self.headers, encoding=self.encoding,
+                                          stream=True)
+            paragraph = ContentFilter.lxml_stream_first(response, *self.STREAM_ATTENDANCE)
+            return "".join(XPATH_NODE_TEXT(paragraph)) if paragraph is not None else ""
         if rt_method is None:
-            rt_method = lambda response: "".join(etree.HTML(response.text).xpath("//td/table//tr/td/p//text()"))
-        response = CustomRequests.get(self.attendance_url, headers=self.headers)
+            rt_method = self._parse_attendance
+        response = CustomRequests.get(self.attendance_url, headers=self.headers, encoding=self.encoding)
         return rt_method(response)
 
     """
@@ -91,12 +192,8 @@ class NexusPHP:
 
     def get_message_list(self, rt_method: callable = None):
         if rt_method is None:
-            rt_method = lambda response: [
-                {"status": "".join(item.xpath("./td[1]/img/@title")), "topic": "".join(item.xpath("./td[2]//text()")),
-                 "from": "".join(item.xpath("./td[3]/text()")), "time": "".join(item.xpath("./td[4]//text()")),
-                 "id": "".join(item.xpath("./td[5]/input/@value"))} for item in
-                etree.HTML(response.text).xpath("//form/table//tr")]
-        response = CustomRequests.get(self.messages_url, headers=self.headers)
+            rt_method = self._parse_message_list
+        response = CustomRequests.get(self.messages_url, headers=self.headers, encoding=self.encoding, cache=True)
         return rt_method(response)
 
     """
@@ -104,15 +201,36 @@ class NexusPHP:
     """
 
     def set_message_read(self, message_id: str, rt_method: callable = lambda response: ""):
-        data = {
-            "action": "moveordel",
-            "messages[]": message_id,
-            "markread": "设为已读",
-            "box": "1"
-        }
-        response = CustomRequests.post(self.messages_url, headers=self.headers, data=data)
+        response = CustomRequests.post(self.messages_url, headers=self.headers, encoding=self.encoding,
+                                       data=self._set_message_read_data(message_id))
         return rt_method(response)
 
+    """
+    轮询直到满足条件，用于操作后的结果确认（如等待群聊区回复、新站内信）
+    本方法为生成器，需在任务中通过 yield from 调用，等待期间不占用执行线程：
+        messages = yield from self.client.poll_until(fetch, predicate)
+    """
+
+    def poll_until(self, fetch: callable, predicate: callable, timeout: float = 10, interval: float = 0.5,
+                   backoff: float = 2, max_interval: float = 4):
+        """
+        :param fetch: 获取当前状态的方法（应尽量轻量）
+        :param predicate: 判断 fetch 结果是否满足条件
+        :param timeout: 最长等待时间（秒）
+        :param interval: 首次重试间隔（秒），之后按 backoff 倍数递增，最大为 max_interval
+        :return: 首个满足条件的 fetch 结果，超时返回 None
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            result = fetch()
+            if predicate(result):
+                return result
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            yield Delay(min(interval, remaining))
+            interval = min(interval * backoff, max_interval)
+
     """
     抽奖
     """
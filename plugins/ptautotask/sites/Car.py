@@ -5,6 +5,8 @@ from ..base.BaseTask import BaseTask
 
 
 class Car(NexusPHP):
+    # 签到与喊话结果使用默认选择器，位于页面开头，流式读取
+    stream_pages = True
 
     def __init__(self, cookie):
         super().__init__(cookie)
@@ -33,7 +35,7 @@ class Tasks(BaseTask):
     def __init__(self, cookie: str):
         super().__init__(Car(cookie))
 
-    @task_info(label="Car 任务领取", hint="领取Car站点的天天快乐任务")
+    @task_info(label="Car 任务领取", hint="领取Car站点的天天快乐任务", period="daily")
     def daily_claim_task(self):
         task_id_list = ["5"]
         return "\n".join([self.client.claim_task(item) for item in task_id_list])
@@ -2,6 +2,8 @@ from ..base.NexusPHP import NexusPHP
 from ..base.BaseTask import BaseTask
 
 class Cyanbug(NexusPHP):
+    # 签到与喊话结果使用默认选择器，位于页面开头，流式读取
+    stream_pages = True
 
     def __init__(self, cookie):
         super().__init__(cookie)
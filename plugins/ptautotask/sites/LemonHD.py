@@ -3,9 +3,12 @@ from ..base.NexusPHP import NexusPHP
 from ..utils.custom_requests import CustomRequests
 from lxml import etree
 from ..base.BaseTask import BaseTask
+from ..utils.content_filter import ContentFilter
 
 
 class LemonHD(NexusPHP):
+    XPATH_LOTTERY_RESULT = etree.XPath("//table/tr[1]/td[1]/text()")
+    XPATH_ATTENDANCE = etree.XPath("//table//tr/td/text()")
 
     def __init__(self, cookie):
         super().__init__(cookie)
@@ -25,7 +28,7 @@ class LemonHD(NexusPHP):
 
     def lottery(self, parameter: tuple = None, rt_method: callable = None):
         response = CustomRequests.post(self.lottery_url, headers=self.headers, data="type=0")
-        return ''.join(etree.HTML(response.text).xpath("//table/tr[1]/td[1]/text()")).strip()
+        return ''.join(self.XPATH_LOTTERY_RESULT(ContentFilter.lxml_get_HTML(response))).strip()
 
 
 class Tasks(BaseTask):
@@ -33,9 +36,8 @@ class Tasks(BaseTask):
         super().__init__(LemonHD(cookie))
 
     def daily_checkin(self):
-        return self.client.attendance(
-            lambda response: "".join(etree.HTML(response.text).xpath('//table//tr/td/text()')).strip())
+        return self.client.attendance().strip()
 
-    @task_info(label="每日神游", hint="执行{client_name}站点的每日免费神游")
+    @task_info(label="每日神游", hint="执行{client_name}站点的每日免费神游", period="daily")
     def daily_lottery(self):
         return self.client.lottery()
@@ -1,9 +1,13 @@
-from ..base.NexusPHP import NexusPHP
+from ..base.AsyncNexusPHP import AsyncNexusPHP
 from lxml import etree
 from ..base.Decorator import task_info
 from ..base.BaseTask import BaseTask
-from ..utils.custom_requests import CustomRequests
-class Qingwa(NexusPHP):
+from ..utils.content_filter import ContentFilter
+from ..utils.async_requests import AsyncCustomRequests
+class Qingwa(AsyncNexusPHP):
+    # 签到结果使用默认选择器，流式读取；喊话使用自定义解析，不受影响
+    stream_pages = True
+    XPATH_SHOUTBOX_REPLY = etree.XPath("//ul[1]/li/text()")
 
     def __init__(self, cookie):
         super().__init__(cookie)
@@ -22,13 +26,13 @@ class Qingwa(NexusPHP):
         return "qingwapt.com"
 
 
-    def send_messagebox(self, message: str, callback=None) -> str:
-        # 调用父类函数，并将回调函数设为rsp_data = etree.HTML(response.text).xpath("//ul[1]/li/text()")
-        return super().send_messagebox(message,
-                                       lambda response: " ".join(etree.HTML(response.text).xpath("//ul[1]/li/text()")))
+    async def send_messagebox(self, message: str, callback=None) -> str:
+        # 调用父类函数，并将回调函数设为取出 //ul[1]/li/text() 的回复内容
+        return await super().send_messagebox(message,
+                                       lambda response: " ".join(self.XPATH_SHOUTBOX_REPLY(ContentFilter.lxml_get_HTML(response))))
 
-    def do_exchange(self,id,amount):
-        response = CustomRequests.post(self.bonusshop_url, headers=self.headers, data={"id": id, "amount": amount})
+    async def do_exchange(self,id,amount):
+        response = await AsyncCustomRequests.post(self.bonusshop_url, headers=self.headers, data={"id": id, "amount": amount})
         return response.json().get("msg", "兑换请求失败")
 
 
@@ -36,14 +40,14 @@ class Tasks(BaseTask):
     def __init__(self, cookie: str):
         super().__init__(Qingwa(cookie))  # 传递 Qingwa 实例
 
-    @task_info(label="青蛙喊话", hint="执行青蛙站点的喊话任务")
-    def daily_shotbox(self):
+    @task_info(label="青蛙喊话", hint="执行青蛙站点的喊话任务", period="daily")
+    async def daily_shotbox(self):
         shbox_text_list = ["蛙总，求上传", "蛙总，求下载"]
-        return "\n".join([self.client.send_messagebox(item) for item in shbox_text_list])
+        return "\n".join([await self.client.send_messagebox(item) for item in shbox_text_list])
 
-    def daily_checkin(self):
-        return self.client.attendance()
+    async def daily_checkin(self):
+        return await self.client.attendance()
 
-    @task_info(label="每日1k蝌蚪", hint="购买青蛙商店的每日福利：1000蝌蚪")
-    def daily_exchange(self):
-        return self.client.do_exchange(28,1)
+    @task_info(label="每日1k蝌蚪", hint="购买青蛙商店的每日福利：1000蝌蚪", period="daily")
+    async def daily_exchange(self):
+        return await self.client.do_exchange(28,1)
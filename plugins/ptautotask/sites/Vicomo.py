@@ -3,10 +3,16 @@ from ..base.NexusPHP import NexusPHP
 from ..utils.custom_requests import CustomRequests
 import datetime
 from ..utils.content_filter import ContentFilter
-import time
 from ..base.BaseTask import BaseTask
+from ..base.Delay import Delay
+from lxml import etree
 
 class Vicomo(NexusPHP):
+    # 签到结果使用默认选择器，流式读取；喊话使用自定义解析，不受影响
+    stream_pages = True
+    XPATH_BATTLE_MSG_INPUT = etree.XPath('//*[@id="battleMsgInput"]')
+    XPATH_BATTLE_INFO = etree.XPath('//*[@id="battleResultStringLastShow"]/div[1]//text()')
+    XPATH_BATTLE_RESULT = etree.XPath('//*[@id="battleResultStringLastShow"]/div[2]/text()')
 
     def __init__(self, cookie):
         super().__init__(cookie)
@@ -28,6 +34,19 @@ class Vicomo(NexusPHP):
         return super().send_messagebox(message,
                                        lambda response: "")
 
+    @staticmethod
+    def message_id(message: dict) -> int:
+        message_id = str(message.get("id", ""))
+        return int(message_id) if message_id.isdigit() else 0
+
+    @classmethod
+    def newest_message(cls, message_list: list, since: int = 0):
+        """
+        返回站内信列表中编号大于 since 的最新一封站内信（第一行为表头），没有时返回 None
+        """
+        newest = max(message_list[1:], key=cls.message_id, default=None)
+        return newest if newest is not None and cls.message_id(newest) > since else None
+
     def vs_boss(self):
         if datetime.date.today().weekday() in [0, 2]:
             vs_boss_data = "option=1&vs_member_name=0&submit=%E9%94%8B%E8%8A%92%E4%BA%A4%E9%94%99+-+1v1"  # Monday Wednesday
@@ -35,11 +54,13 @@ class Vicomo(NexusPHP):
             vs_boss_data = "option=1&vs_member_name=0%2C1%2C2%2C3%2C4&submit=%E9%BE%99%E4%B8%8E%E5%87%A4%E7%9A%84%E6%8A%97%E8%A1%A1+-+%E5%9B%A2%E6%88%98+5v5"  # Thuesday Thursday
         elif datetime.date.today().weekday() in [4, 5, 6]:
             vs_boss_data = "option=1&vs_member_name=0%2C1%2C2%2C3%2C4%2C5%2C6%2C7%2C8%2C9%2C10%2C11%2C12%2C13%2C14%2C15%2C16&submit=%E4%B8%96%E7%95%8Cboss+-+%E5%AF%B9%E6%8A%97Sysrous"
-        self.headers.update({
+        # 使用请求头副本，避免影响同一客户端上的其他任务
+        headers = {
+            **self.headers,
             "content-type": "application/x-www-form-urlencoded",
             "pragma": "no-cache",
-        })
-        response = CustomRequests.post(self.vs_boss_url, headers=self.headers, data=vs_boss_data)
+        }
+        response = CustomRequests.post(self.vs_boss_url, headers=headers, data=vs_boss_data)
 
         # """提取签到信息"""
         match = ContentFilter.re_get_match(response, r"\[签到已得(\d+), 补签卡: (\d+)\]")
@@ -61,20 +82,20 @@ class Vicomo(NexusPHP):
             return None
 
         # 访问重定向 URL
-        battle_result_response = CustomRequests.get(redirect_url, headers=self.headers)
+        battle_result_response = CustomRequests.get(redirect_url, headers=headers)
         print(f"战斗结果重定向页面状态码: {battle_result_response.status_code}")
         # print(battle_result_response.text)  # 可选：调试时查看响应内容
 
         # 解析战斗结果页面并提取 battleMsgInput
         parsed_html = ContentFilter.lxml_get_HTML(battle_result_response)
-        battle_msg_input = parsed_html.xpath('//*[@id="battleMsgInput"]')
+        battle_msg_input = self.XPATH_BATTLE_MSG_INPUT(parsed_html)
         if battle_msg_input:
-            battle_info = parsed_html.xpath('//*[@id="battleResultStringLastShow"]/div[1]//text()')
+            battle_info = self.XPATH_BATTLE_INFO(parsed_html)
             battle_text = ' '.join([text.strip() for text in battle_info if text.strip()])
             print("找到Battle Info:", battle_text)
-            print("找到Battle Result:",
-                  parsed_html.xpath('//*[@id="battleResultStringLastShow"]/div[2]/text()')[0].strip())
-            return parsed_html.xpath('//*[@id="battleResultStringLastShow"]/div[2]/text()')[0].strip()
+            battle_result = self.XPATH_BATTLE_RESULT(parsed_html)[0].strip()
+            print("找到Battle Result:", battle_result)
+            return battle_result
         else:
             print("未找到Battle Result")
             return None
@@ -87,22 +108,30 @@ class Tasks(BaseTask):
     def daily_shotbox(self):
         shbox_text_list = ["小象求象草"]
         rsp_text_list = []
+        # 喊话前读取一次站内信列表作为基准，回复为编号大于基准的新站内信
+        newest = self.client.newest_message(self.client.get_message_list())
+        latest_id = self.client.message_id(newest) if newest else 0
         for item in shbox_text_list:
             self.client.send_messagebox(item)
-            message_list = self.client.get_message_list()
-            if message_list:
-                message = message_list[1].get("topic", "")
-                rsp_text_list.append(message)
-                self.client.set_message_read(message_list[1].get("id", ""))
+            # 轮询站内信列表，直到收到新的站内信（即喊话的回复）
+            message_list = yield from self.client.poll_until(
+                self.client.get_message_list,
+                lambda messages, since=latest_id: self.client.newest_message(messages, since) is not None)
+            reply = self.client.newest_message(message_list, latest_id) if message_list else None
+            if reply:
+                rsp_text_list.append(reply.get("topic", ""))
+                self.client.set_message_read(reply.get("id", ""))
+                latest_id = self.client.message_id(reply)
         return "\n".join(rsp_text_list)
 
     def daily_checkin(self):
         return self.client.attendance()
 
-    @task_info(label="打Boss", hint="执行象站的打Boss任务")
+    @task_info(label="打Boss", hint="执行象站的打Boss任务", period="daily")
     def daily_vs_boss(self):
         rsp_list = []
         for i in range(3):
+            if i:
+                yield Delay(10)  # 间隔10秒，等待期间不占用执行线程
             rsp_list.append(self.client.vs_boss())
-            time.sleep(10)  # 休眠10秒
         return "\n".join([rsp for rsp in rsp_list if rsp])
@@ -34,7 +34,7 @@ class Tasks(BaseTask):
         super().__init__(ZhuQue(cookie))
 
     # CSRF问题，无法使用
-    #@task_info("释放技能", "批量释放朱雀站点所有角色的技能")
+    #@task_info("释放技能", "批量释放朱雀站点所有角色的技能", period=None)
     def daily_release_skill(self):
         return self.client.do_release_skill()
 
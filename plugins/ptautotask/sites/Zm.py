@@ -1,13 +1,26 @@
-import time
+import base64
+import binascii
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs, unquote, urlsplit
 
 from ..base.Decorator import task_info
 from ..base.NexusPHP import NexusPHP
 from lxml import etree
+from ..utils.content_filter import ContentFilter, XPATH_NODE_TEXT
 from ..utils.custom_requests import CustomRequests
 from ..base.BaseTask import BaseTask
 
 
 class Zm(NexusPHP):
+    # 签到结果使用默认选择器，流式读取；喊话使用自定义解析，不受影响
+    stream_pages = True
+    # 群聊区中回复喊话的机器人名称
+    SHOUTBOX_BOT = "皮总"
+    # 轮询回复时读取的群聊区行数
+    SHOUTBOX_POLL_ROWS = 10
+    # 群聊区每行的发送者：第一个用户链接，没有链接时为第一个非时间的 span
+    XPATH_SHOUTBOX_SENDER = etree.XPath(
+        "(.//a[contains(@href, 'userdetails.php')] | .//span[not(contains(@class, 'date'))])[1]")
 
     def __init__(self, cookie):
         super().__init__(cookie)
@@ -25,8 +38,91 @@ class Zm(NexusPHP):
     def get_site_domain():
         return "zmpt.cc"
 
-    def send_messagebox(self, message: str, callback=None) -> str:
-        return super().send_messagebox(message, lambda response: "")
+    @staticmethod
+    def _row_key(row: str) -> str:
+        # 整行解析与按单元格解析得到的文本空白不同，比较时忽略空白
+        return "".join(row.split())
+
+    @property
+    def uid(self):
+        """
+        当前账号的用户 id，取自 NexusPHP 的 c_secure_uid cookie（base64 编码，可能经过 URL 编码），无法解析时为 None
+        """
+        cookie = SimpleCookie()
+        try:
+            cookie.load(self.cookie or "")
+            return base64.b64decode(unquote(cookie["c_secure_uid"].value)).decode("ascii")
+        except (KeyError, ValueError, binascii.Error, UnicodeDecodeError):
+            return None
+
+    @classmethod
+    def parse_shoutbox_row(cls, cell) -> dict:
+        """
+        解析群聊区的一行：{"sender": 发送者名称, "uid": 发送者 id, "text": 整行文本}
+        """
+        senders = cls.XPATH_SHOUTBOX_SENDER(cell)
+        sender = senders[0] if senders else None
+        uid = None
+        if sender is not None and sender.tag == "a":
+            uid = (parse_qs(urlsplit(sender.get("href") or "").query).get("id") or [None])[0]
+        return {
+            "sender": "".join(XPATH_NODE_TEXT(sender)).strip() if sender is not None else "",
+            "uid": uid,
+            "text": "".join(XPATH_NODE_TEXT(cell)),
+        }
+
+    @classmethod
+    def parse_shoutbox_rows(cls, response) -> list:
+        return [cls.parse_shoutbox_row(cell)
+                for cell in cls.XPATH_SHOUTBOX_CELLS(ContentFilter.lxml_get_HTML(response))]
+
+    def get_shoutbox_rows(self, limit: int = None) -> list:
+        """
+        读取群聊区（最新在前）并解析每行的发送者，传入 limit 时读取到足够的行数即停止下载
+        """
+        if not limit:
+            response = CustomRequests.get(self.url_shoutbox, headers=self.headers, encoding=self.encoding)
+            return self.parse_shoutbox_rows(response)
+        response = CustomRequests.get(self.url_shoutbox, headers=self.headers, encoding=self.encoding, stream=True)
+        rows = []
+        cells = ContentFilter.lxml_iter_stream(response, *self.STREAM_SHOUTBOX_CELL)
+        try:
+            for cell in cells:
+                rows.append(self.parse_shoutbox_row(cell))
+                if len(rows) >= limit:
+                    break
+        finally:
+            cells.close()
+        return rows
+
+    def is_own_row(self, row: dict) -> bool:
+        """
+        判断该行是否由当前账号发送；cookie 中没有用户 id 时，除机器人外的行都视为可能由本账号发送
+        """
+        uid = self.uid
+        if uid is not None:
+            return row["uid"] == uid
+        return row["sender"] != self.SHOUTBOX_BOT
+
+    def find_shout(self, rows: list, text: str):
+        """
+        在群聊区（最新在前）中查找本账号最近一次发送的 text，未找到时返回 None。
+        喊话之后其他用户的消息可能排在更前面，因此不要求喊话位于第一行
+        """
+        key = self._row_key(text)
+        return next((row for row in rows if self.is_own_row(row) and key in self._row_key(row["text"])), None)
+
+    def find_reply(self, rows: list, shout: dict):
+        """
+        在群聊区（最新在前）中查找比 shout 更新、发送者为机器人的行，未找到时返回 None
+        """
+        shout_key = (shout["sender"], self._row_key(shout["text"]))
+        index = next((index for index, row in enumerate(rows)
+                      if (row["sender"], self._row_key(row["text"])) == shout_key), None)
+        if index is None:
+            return None
+        # 取最早的一条回复，即紧接在喊话之后的机器人消息
+        return next((row for row in reversed(rows[:index]) if row["sender"] == self.SHOUTBOX_BOT), None)
 
     def medal_bonus(self):
         response = CustomRequests.get(self.bonus_url, headers=self.headers)
@@ -61,17 +157,22 @@ class Tasks(BaseTask):
         shbox_text_list = ["皮总，求电力", "皮总，求上传"]
         rsp_text_list = []
         for item in shbox_text_list:
-            self.client.send_messagebox(item)
-            time.sleep(3)
-            message_list = self.client.get_messagebox()
-            if message_list:
-                message = message_list[0]
-                rsp_text_list.append(message)
+            # 在喊话返回的群聊区中找到本账号的这条喊话，之后出现在其上方、由机器人发送的消息即为回复
+            rows = self.client.send_messagebox(item, rt_method=self.client.parse_shoutbox_rows)
+            shout = self.client.find_shout(rows, item)
+            if shout is None:
+                rsp_text_list.append(f"{item}：喊话失败")
+                continue
+            message_list = yield from self.client.poll_until(
+                lambda: self.client.get_shoutbox_rows(limit=self.client.SHOUTBOX_POLL_ROWS),
+                lambda messages, row=shout: self.client.find_reply(messages, row) is not None)
+            reply = self.client.find_reply(message_list, shout) if message_list else None
+            rsp_text_list.append(reply["text"] if reply else f"{item}：未获取到回复")
         return "\n".join(rsp_text_list)
 
     def daily_checkin(self):
         return self.client.attendance()
 
-    @task_info(label="织梦勋章奖励", hint="领取织梦站点的梅兰竹菊成套勋章奖励")
+    @task_info(label="织梦勋章奖励", hint="领取织梦站点的梅兰竹菊成套勋章奖励", period="daily")
     def medal_bonus(self):
         return self.client.medal_bonus()
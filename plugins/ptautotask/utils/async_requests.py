@@ -0,0 +1,109 @@
+import asyncio
+import time
+from urllib.parse import urlparse
+
+from .config import Config
+from .custom_requests import CustomRequests, apply_encoding
+from .metrics import Metrics
+from .timing import RequestTiming
+# 未安装 httpx 时退化为在线程池中执行同步请求
+from .transport import CONNECT_TIMEOUT_ERRORS, HTTP2_AVAILABLE, READ_TIMEOUT_ERRORS, HttpxTransport, httpx, \
+    httpx_timeout
+
+
+class AsyncCustomRequests:
+    """
+    CustomRequests 的异步版本。
+    安装了 httpx 时使用按域名复用的 httpx.AsyncClient，否则在线程中执行同步请求。
+    客户端与创建它的事件循环绑定，一次运行结束时需调用 aclose 释放。
+    """
+    _clients = {}  # netloc -> httpx.AsyncClient
+    # 自定义的 httpx 异步传输层（httpx.AsyncBaseTransport），为空时使用 httpx 默认的连接池
+    transport = None
+
+    @classmethod
+    def _get_client(cls, url):
+        netloc = urlparse(url).netloc
+        client = cls._clients.get(netloc)
+        if client is None:
+            limits = httpx.Limits(max_connections=Config.POOL_MAXSIZE,
+                                  max_keepalive_connections=Config.POOL_MAXSIZE,
+                                  keepalive_expiry=Config.SESSION_IDLE_TIMEOUT)
+            # 仅在同步请求也选择了 httpx 传输层时启用 HTTP/2
+            http2 = HTTP2_AVAILABLE and CustomRequests.transport.name == "httpx"
+            client = httpx.AsyncClient(http2=http2, limits=limits, follow_redirects=True, transport=cls.transport)
+            cls._clients[netloc] = client
+        return client
+
+    @classmethod
+    async def aclose(cls):
+        """
+        关闭所有异步客户端
+        """
+        clients = list(cls._clients.values())
+        cls._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+    @staticmethod
+    async def _trace(event_name: str, info: dict):
+        """
+        httpx.AsyncClient 的 trace 回调需为协程，记录方式与同步传输层相同
+        """
+        HttpxTransport._trace(event_name, info)
+
+    @classmethod
+    async def request(cls, method, url, headers=None, params=None, data=None, timeout=None,
+                      encoding=None):
+        if httpx is None:
+            return await asyncio.to_thread(CustomRequests.request, method, url, headers=headers, params=params,
+                                           data=data, timeout=timeout, encoding=encoding)
+        # 与同步请求共用按域名的限速令牌桶，等待时不阻塞事件循环
+        wait = CustomRequests.rate_limiter.reserve(url)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        adaptive = timeout is None
+        if adaptive:
+            timeout = CustomRequests.timeouts.timeout(url)
+        client = cls._get_client(url)
+        started = time.perf_counter()
+        extensions = {"trace": cls._trace}
+        try:
+            with RequestTiming.request(method, url) as span:
+                # httpx 中字符串/字节形式的请求体需通过 content 传递
+                if isinstance(data, (str, bytes)):
+                    response = await client.request(method, url, headers=headers, params=params, content=data,
+                                                    timeout=httpx_timeout(timeout), extensions=extensions)
+                else:
+                    response = await client.request(method, url, headers=headers, params=params, data=data,
+                                                    timeout=httpx_timeout(timeout), extensions=extensions)
+        except Exception as e:
+            Metrics.observe_http(method, url, "error", time.perf_counter() - started)
+            # 仅在使用学习到的超时时记录超时，调用方显式指定的超时不代表站点的实际耗时
+            if adaptive and isinstance(e, CONNECT_TIMEOUT_ERRORS + READ_TIMEOUT_ERRORS):
+                CustomRequests.timeouts.observe_timeout(url, timeout, connect=isinstance(e, CONNECT_TIMEOUT_ERRORS))
+            raise
+        elapsed = time.perf_counter() - started
+        Metrics.observe_http(method, url, response.status_code, elapsed)
+        if span is not None:
+            CustomRequests.timeouts.observe(url, connect=span["connect"], read=span["ttfb"])
+        else:
+            CustomRequests.timeouts.observe(url, read=elapsed)
+        RequestTiming.bind(response, span)
+        return apply_encoding(response, encoding)
+
+    @classmethod
+    async def get(cls, url, headers=None, params=None, timeout=None, encoding=None):
+        return await cls.request("GET", url, headers=headers, params=params, timeout=timeout, encoding=encoding)
+
+    @classmethod
+    async def post(cls, url, headers=None, data=None, timeout=None, encoding=None):
+        return await cls.request("POST", url, headers=headers, data=data, timeout=timeout, encoding=encoding)
+
+    @classmethod
+    async def put(cls, url, headers=None, data=None, timeout=None):
+        return await cls.request("PUT", url, headers=headers, data=data, timeout=timeout)
+
+    @classmethod
+    async def delete(cls, url, headers=None, data=None, timeout=None):
+        return await cls.request("DELETE", url, headers=headers, data=data, timeout=timeout)
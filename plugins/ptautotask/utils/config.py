@@ -1,2 +1,26 @@
 class Config:
-    REQUEST_TIMEOUT = 5  # Default timeout for requests in seconds
\ No newline at end of file
+    REQUEST_TIMEOUT = 5  # Default timeout for requests in seconds
+    POOL_CONNECTIONS = 10  # Number of connection pools cached per session
+    POOL_MAXSIZE = 10  # Maximum number of connections kept alive per host
+    SESSION_IDLE_TIMEOUT = 300  # Seconds before an idle per-domain session is closed
+    STREAM_CHUNK_SIZE = 8192  # Chunk size in bytes when reading a streamed response
+    STREAM_MAX_BYTES = 256 * 1024  # Hard cap on bytes read from a streamed response
+    STREAM_DRAIN_BYTES = 64 * 1024  # Remaining body read after an early exit so the keep-alive connection is reused
+    RATE_LIMIT_RATE = 1.0  # Sustained requests per second allowed per domain (0 disables the limit)
+    RATE_LIMIT_BURST = 3  # Requests per domain that may be sent back to back
+    RATE_LIMIT_MIN_INTERVAL = 0.2  # Minimum spacing in seconds between two requests to one domain
+    CACHE_MAX_ENTRIES = 64  # Maximum number of pages kept by the conditional GET cache
+    CACHE_MAX_BODY_BYTES = 1024 * 1024  # Pages larger than this are not cached
+    CACHE_MAX_TOTAL_BYTES = 8 * 1024 * 1024  # Total body bytes kept by the conditional GET cache
+    HTTP_TRANSPORT = "requests"  # "requests"; opt in with "httpx" (HTTP/2 when h2 is installed) or "auto" (httpx only if h2 is installed)
+    TIMEOUT_CONNECT_FLOOR = 2  # Lower bound in seconds for a learned connect timeout
+    TIMEOUT_CONNECT_CEILING = 10  # Upper bound in seconds for a learned connect timeout
+    TIMEOUT_READ_FLOOR = 3  # Lower bound in seconds for a learned read timeout
+    TIMEOUT_READ_CEILING = 20  # Upper bound in seconds for a learned read timeout
+    TIMEOUT_HEAVY_PATHS = ("/lottery.php", "/customgame.php")  # Slow endpoints learned and bounded separately
+    TIMEOUT_HEAVY_READ_FLOOR = 10  # Lower bound (and initial value) in seconds for the read timeout of slow endpoints
+    TIMEOUT_HEAVY_READ_CEILING = 60  # Upper bound in seconds for the read timeout of slow endpoints
+    TIMEOUT_PERCENTILE = 95  # Latency percentile the learned timeouts are based on
+    TIMEOUT_MULTIPLIER = 3  # Learned timeout = percentile latency x multiplier
+    TIMEOUT_SAMPLES = 50  # Latency samples kept per domain (or slow endpoint)
+    TIMEOUT_MIN_SAMPLES = 5  # Samples needed before REQUEST_TIMEOUT is replaced by the learned value
@@ -1,31 +1,263 @@
+import codecs
+import threading
+import time
+import weakref
+from functools import lru_cache
+
 from lxml import etree
 import re
 
+from .config import Config
+from .timing import RequestTiming
+
+# 常用的相对路径：节点下的全部文本
+XPATH_NODE_TEXT = etree.XPath(".//text()")
+# 页面 meta 标签中声明的编码，仅在响应头未声明 charset 时使用
+META_CHARSET_PATTERN = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w-]+)""", re.IGNORECASE)
+META_CHARSET_SCAN_BYTES = 4096
+
 
 class ContentFilter:
+    # 每个响应解析后的文档缓存：response -> {"encoding": 编码, "text": 解码后的文本, "tree": lxml 文档树}
+    # 以响应对象本身为键，同一页面多次提取只解码/解析一次，运行结束时调用 clear_cache 清空
+    _documents = weakref.WeakKeyDictionary()
+    _documents_lock = threading.Lock()
+    _parsers = threading.local()
+
+    @staticmethod
+    def _document(response) -> dict:
+        with ContentFilter._documents_lock:
+            document = ContentFilter._documents.get(response)
+            if document is None:
+                document = {}
+                ContentFilter._documents[response] = document
+            return document
+
+    @staticmethod
+    def clear_cache():
+        with ContentFilter._documents_lock:
+            ContentFilter._documents.clear()
+
+    @staticmethod
+    def _declared_encoding(response):
+        """
+        响应头 charset 或站点声明的编码，均未声明时返回 None（不读取响应内容）
+        """
+        content_type = response.headers.get("content-type", "")
+        if "charset=" in content_type.lower():
+            return content_type.lower().split("charset=")[-1].split(";")[0].strip(" \"'")
+        # requests 对未声明 charset 的 text/* 响应默认给出 ISO-8859-1，此时视为未声明
+        encoding = getattr(response, "encoding", None)
+        if encoding and encoding.lower() != "iso-8859-1":
+            return encoding
+        return None
+
+    @staticmethod
+    def get_encoding(response) -> str:
+        """
+        确定响应编码，不做字符集探测：
+        响应头 charset > 站点声明的编码 > 页面 meta 标签 > utf-8
+        """
+        encoding = ContentFilter._declared_encoding(response)
+        if encoding:
+            return encoding
+        match = META_CHARSET_PATTERN.search(response.content[:META_CHARSET_SCAN_BYTES])
+        if match:
+            return match.group(1).decode("ascii", "ignore")
+        return "utf-8"
+
+    @staticmethod
+    def _encoding(response) -> str:
+        document = ContentFilter._document(response)
+        if "encoding" not in document:
+            document["encoding"] = ContentFilter.get_encoding(response)
+        return document["encoding"]
+
+    @staticmethod
+    def get_response_text(response) -> str:
+        """
+        获取响应的文本内容，直接按确定的编码解码字节，同一响应只解码一次
+        """
+        document = ContentFilter._document(response)
+        if "text" not in document:
+            start = time.perf_counter()
+            try:
+                document["text"] = response.content.decode(ContentFilter._encoding(response), errors="replace")
+            except LookupError:
+                document["text"] = response.content.decode("utf-8", errors="replace")
+            RequestTiming.add(response, "parse", time.perf_counter() - start)
+        return document["text"]
+
+    @staticmethod
+    def _html_parser(encoding: str) -> etree.HTMLParser:
+        # lxml 解析器不可跨线程共享，按线程缓存
+        parsers = getattr(ContentFilter._parsers, "cache", None)
+        if parsers is None:
+            parsers = ContentFilter._parsers.cache = {}
+        parser = parsers.get(encoding)
+        if parser is None:
+            try:
+                parser = etree.HTMLParser(encoding=encoding)
+            except LookupError:
+                parser = etree.HTMLParser(encoding="utf-8")
+            parsers[encoding] = parser
+        return parser
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _compile(xpath: str) -> etree.XPath:
+        return etree.XPath(xpath)
+
+    @staticmethod
+    def xpath(xpath):
+        """
+        获取预编译的 XPath 对象，字符串表达式只在首次使用时编译，已编译的对象原样返回
+        """
+        if isinstance(xpath, etree.XPath):
+            return xpath
+        return ContentFilter._compile(xpath)
 
     @staticmethod
     def lxml_get_HTML(response):
-        return etree.HTML(response.text)
+        """
+        获取响应的 lxml 文档树，直接解析响应字节，同一响应只解析一次
+        """
+        document = ContentFilter._document(response)
+        if "tree" not in document:
+            start = time.perf_counter()
+            document["tree"] = etree.HTML(response.content,
+                                          parser=ContentFilter._html_parser(ContentFilter._encoding(response)))
+            RequestTiming.add(response, "parse", time.perf_counter() - start)
+        return document["tree"]
 
     @staticmethod
     def lxml_get_text(response, xpath, split_str=""):
-        return split_str.join(etree.HTML(response.text).xpath(xpath))
+        return split_str.join(ContentFilter.xpath(xpath)(ContentFilter.lxml_get_HTML(response)))
 
     @staticmethod
     def lxml_get_texts(response, xpath, split_str=""):
-        return [split_str.join(item.xpath(".//text()")) for item in etree.HTML(response.text).xpath(xpath)]
+        return [split_str.join(XPATH_NODE_TEXT(item))
+                for item in ContentFilter.xpath(xpath)(ContentFilter.lxml_get_HTML(response))]
 
     @staticmethod
     def re_get_text(response, pattern, group=0):
-        match = re.search(pattern, response.text)
+        match = re.search(pattern, ContentFilter.get_response_text(response))
         return match.group(group) if match else None
 
     @staticmethod
     def re_get_texts(response, pattern, group=0):
-        return [match.group(group) for match in re.finditer(pattern, response.text)]
+        return [match.group(group) for match in re.finditer(pattern, ContentFilter.get_response_text(response))]
 
     @staticmethod
     def re_get_match(response, pattern):
-        match = re.search(pattern, response.text)
+        match = re.search(pattern, ContentFilter.get_response_text(response))
         return match
+
+    """
+    流式解析：用于只需要页面开头少量内容的场景，边下载边解析，
+    找到目标后停止解析，且单个响应读取的字节数不超过 max_bytes。
+    提前停止时剩余内容不超过 Config.STREAM_DRAIN_BYTES 则读完后释放，连接放回连接池复用；否则直接断开连接。
+    响应需以 stream=True 方式请求。
+    """
+
+    @staticmethod
+    def _iter_chunks(response, max_bytes):
+        read_bytes = 0
+        chunks = response.iter_content(chunk_size=Config.STREAM_CHUNK_SIZE)
+        while True:
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            RequestTiming.add(response, "download", time.perf_counter() - start)
+            if chunk is None:
+                break
+            if not chunk:
+                continue
+            read_bytes += len(chunk)
+            try:
+                yield chunk
+            except GeneratorExit:
+                # 调用方已找到目标，读完剩余的少量内容以便复用连接
+                ContentFilter._drain(response, chunks)
+                raise
+            if read_bytes >= max_bytes:
+                break
+
+    @staticmethod
+    def _drain(response, chunks, max_bytes=Config.STREAM_DRAIN_BYTES):
+        """
+        读完响应剩余的内容（不解析）；超过 max_bytes 或读取出错时放弃，由调用方关闭响应时断开连接
+        """
+        drained = 0
+        start = time.perf_counter()
+        try:
+            for chunk in chunks:
+                drained += len(chunk)
+                if drained > max_bytes:
+                    break
+        except Exception:
+            pass
+        finally:
+            RequestTiming.add(response, "download", time.perf_counter() - start)
+
+    @staticmethod
+    def lxml_iter_stream(response, tag, match=None, max_bytes=Config.STREAM_MAX_BYTES):
+        """
+        增量解析响应，依次产出解析完成且满足 match 的 tag 元素；迭代结束或提前退出时释放响应
+        :param tag: 目标元素标签名
+        :param match: 可选的 XPath（字符串或已编译对象），以元素为上下文求值，结果为真时产出该元素
+        """
+        match = ContentFilter.xpath(match) if match is not None else None
+        parser = etree.HTMLPullParser(events=("end",), tag=tag,
+                                      encoding=ContentFilter._declared_encoding(response))
+        chunks = ContentFilter._iter_chunks(response, max_bytes)
+        try:
+            for chunk in chunks:
+                start = time.perf_counter()
+                parser.feed(chunk)
+                events = list(parser.read_events())
+                RequestTiming.add(response, "parse", time.perf_counter() - start)
+                for _, element in events:
+                    if match is None or match(element):
+                        yield element
+        finally:
+            chunks.close()
+            response.close()
+
+    @staticmethod
+    def lxml_stream_first(response, tag, match=None, max_bytes=Config.STREAM_MAX_BYTES):
+        """
+        增量解析响应，返回第一个满足条件的 tag 元素并释放响应，未找到时返回 None
+        """
+        elements = ContentFilter.lxml_iter_stream(response, tag, match, max_bytes)
+        try:
+            return next(elements, None)
+        finally:
+            elements.close()
+
+    @staticmethod
+    def re_stream_get_match(response, pattern, max_bytes=Config.STREAM_MAX_BYTES):
+        """
+        边下载边匹配正则，匹配成功后停止读取并释放响应，未匹配时返回 None
+        """
+        pattern = re.compile(pattern) if isinstance(pattern, str) else pattern
+        decoder = codecs.getincrementaldecoder(ContentFilter._declared_encoding(response) or "utf-8")(
+            errors="replace")
+        text = ""
+        chunks = ContentFilter._iter_chunks(response, max_bytes)
+        try:
+            for chunk in chunks:
+                start = time.perf_counter()
+                text += decoder.decode(chunk)
+                match = pattern.search(text)
+                RequestTiming.add(response, "parse", time.perf_counter() - start)
+                if match:
+                    return match
+            return pattern.search(text + decoder.decode(b"", final=True))
+        finally:
+            chunks.close()
+            response.close()
+
+    @staticmethod
+    def re_stream_get_text(response, pattern, group=0, max_bytes=Config.STREAM_MAX_BYTES):
+        match = ContentFilter.re_stream_get_match(response, pattern, max_bytes)
+        return match.group(group) if match else None
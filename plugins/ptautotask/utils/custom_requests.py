@@ -1,24 +1,290 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
 import requests
+from requests.models import PreparedRequest
+from requests.structures import CaseInsensitiveDict
+
 from .config import Config
+from .metrics import Metrics
+from .timeouts import AdaptiveTimeouts
+from .timing import RequestTiming
+from .transport import CONNECT_TIMEOUT_ERRORS, READ_TIMEOUT_ERRORS, create_transport
 
 
-class CustomRequests:
-    @staticmethod
-    def get(url, headers=None, params=None, timeout=Config.REQUEST_TIMEOUT):
-        response = requests.get(url, headers=headers, params=params, timeout=timeout)
-        return response
+def apply_encoding(response, encoding: str = None):
+    """
+    响应头未声明 charset 时使用站点声明的编码，避免读取 response.text 时对整个页面进行字符集探测
+    """
+    if encoding and "charset=" not in response.headers.get("content-type", "").lower():
+        response.encoding = encoding
+    return response
 
-    @staticmethod
-    def post(url, headers=None, data=None, timeout=Config.REQUEST_TIMEOUT):
-        response = requests.post(url, headers=headers, data=data, timeout=timeout)
-        return response
 
-    @staticmethod
-    def put(url, headers=None, data=None, timeout=Config.REQUEST_TIMEOUT):
-        response = requests.put(url, headers=headers, data=data, timeout=timeout)
-        return response
+class TokenBucket:
+    """
+    令牌桶：以 rate 的速度补充令牌，最多积累 burst 个，且两次请求之间至少间隔 min_interval 秒
+    """
+
+    def __init__(self, rate: float, burst: int, min_interval: float):
+        self.rate = rate
+        self.burst = max(1, int(burst))
+        self.min_interval = max(0.0, min_interval)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._next_allowed = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        预约一个令牌，返回调用方在发出请求前需要等待的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            if self.rate > 0:
+                self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                self._tokens -= 1
+                if self._tokens < 0:
+                    wait = -self._tokens / self.rate
+            start = max(now + wait, self._next_allowed)
+            self._next_allowed = start + self.min_interval
+            return start - now
+
+
+class RateLimiter:
+    """
+    按域名限制请求频率，所有经过 CustomRequests 的请求统一生效
+    """
+
+    def __init__(self):
+        self._buckets = {}  # netloc -> TokenBucket
+        self._lock = threading.Lock()
+
+    def configure(self, url: str, rate: float = None, burst: int = None, min_interval: float = None):
+        """
+        设置 url 所属域名的限速参数，未指定的参数使用 Config 中的默认值
+        """
+        rate = Config.RATE_LIMIT_RATE if rate is None else rate
+        burst = Config.RATE_LIMIT_BURST if burst is None else burst
+        min_interval = Config.RATE_LIMIT_MIN_INTERVAL if min_interval is None else min_interval
+        netloc = urlparse(url).netloc
+        with self._lock:
+            bucket = self._buckets.get(netloc)
+            if bucket is None or (bucket.rate, bucket.burst, bucket.min_interval) != (rate, burst, min_interval):
+                self._buckets[netloc] = TokenBucket(rate, burst, min_interval)
+
+    def reserve(self, url: str) -> float:
+        """
+        为一次请求预约令牌，返回需要等待的秒数
+        """
+        netloc = urlparse(url).netloc
+        with self._lock:
+            bucket = self._buckets.get(netloc)
+            if bucket is None:
+                bucket = TokenBucket(Config.RATE_LIMIT_RATE, Config.RATE_LIMIT_BURST, Config.RATE_LIMIT_MIN_INTERVAL)
+                self._buckets[netloc] = bucket
+        return bucket.reserve()
+
+    def acquire(self, url: str):
+        """
+        阻塞直到允许向 url 所属域名发出请求
+        """
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+
+
+class ResponseCache:
+    """
+    条件请求缓存：保存带 ETag / Last-Modified 的 GET 响应，
+    再次请求时携带 If-None-Match / If-Modified-Since，服务器返回 304 时直接使用缓存内容。
+    按最近使用顺序淘汰，同时限制条目数与页面总字节数；缓存 key 包含 Cookie 摘要，不同账号之间不会串用页面。
+    """
+
+    def __init__(self, max_entries: int = Config.CACHE_MAX_ENTRIES, max_body_bytes: int = Config.CACHE_MAX_BODY_BYTES,
+                 max_total_bytes: int = Config.CACHE_MAX_TOTAL_BYTES):
+        self.max_entries = max_entries
+        self.max_body_bytes = max_body_bytes
+        self.max_total_bytes = max_total_bytes
+        self._entries = OrderedDict()  # key -> dict
+        self._total_bytes = 0
+        self._lock = threading.Lock()
 
     @staticmethod
-    def delete(url, headers=None, data=None, timeout=Config.REQUEST_TIMEOUT):
-        response = requests.delete(url, headers=headers, data=data, timeout=timeout)
+    def key(url: str, params=None, headers=None) -> tuple:
+        prepared = PreparedRequest()
+        prepared.prepare_url(url, params)
+        cookie = CaseInsensitiveDict(headers or {}).get("cookie") or ""
+        return prepared.url, hashlib.sha1(cookie.encode("utf-8")).hexdigest()
+
+    def validators(self, key: tuple) -> dict:
+        """
+        返回需要附加到请求上的条件请求头，未缓存时返回空字典
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return {}
+            self._entries.move_to_end(key)
+        headers = {}
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, key: tuple, response):
+        """
+        保存 200 响应，没有校验头、声明 no-store 或过大的页面不缓存
+        """
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+        if response.status_code != 200 or not (etag or last_modified):
+            return
+        if "no-store" in response.headers.get("cache-control", "").lower():
+            return
+        content = response.content
+        if len(content) > min(self.max_body_bytes, self.max_total_bytes):
+            return
+        entry = {"etag": etag, "last_modified": last_modified, "headers": dict(response.headers),
+                 "content": content, "encoding": response.encoding}
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= len(previous["content"])
+            self._entries[key] = entry
+            self._total_bytes += len(content)
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_total_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= len(evicted["content"])
+
+    def revalidated(self, key: tuple, response):
+        """
+        根据 304 响应构造包含缓存内容的 200 响应，缓存已被淘汰时返回 None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            # 304 响应可能携带新的校验头
+            entry["headers"].update(response.headers)
+            entry["etag"] = response.headers.get("etag") or entry["etag"]
+            entry["last_modified"] = response.headers.get("last-modified") or entry["last_modified"]
+            self._entries.move_to_end(key)
+        cached = requests.Response()
+        cached.status_code = 200
+        cached.reason = "OK"
+        cached.headers = CaseInsensitiveDict(entry["headers"])
+        cached._content = entry["content"]
+        cached.encoding = entry["encoding"]
+        cached.url = str(response.url)
+        cached.request = response.request
+        cached.history = response.history
+        cached.elapsed = response.elapsed
+        cached.connection = getattr(response, "connection", None)
+        return cached
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+
+class CustomRequests:
+    # 传输层：默认使用 requests，可通过 Config.HTTP_TRANSPORT 或 configure 切换为 httpx（HTTP/2）
+    transport = create_transport()
+    rate_limiter = RateLimiter()
+    response_cache = ResponseCache()
+    # 按域名学习的连接/读取超时，未显式指定 timeout 的请求使用
+    timeouts = AdaptiveTimeouts()
+
+    @classmethod
+    def configure(cls, pool_connections=None, pool_maxsize=None, idle_timeout=None, transport: str = None):
+        """
+        调整连接池参数或传输层，已存在的连接会被关闭并在下次请求时按新参数重建
+        :param transport: "requests"、"httpx" 或 "auto"，为空时保持当前传输层
+        """
+        current = cls.transport
+        current.close()
+        cls.transport = create_transport(transport or current.name,
+                                         pool_connections=pool_connections or Config.POOL_CONNECTIONS,
+                                         pool_maxsize=pool_maxsize or Config.POOL_MAXSIZE,
+                                         idle_timeout=idle_timeout or Config.SESSION_IDLE_TIMEOUT)
+
+    @classmethod
+    def close(cls):
+        cls.transport.close()
+        cls.response_cache.clear()
+
+    @classmethod
+    def request(cls, method, url, headers=None, params=None, data=None, timeout=None,
+                encoding=None, stream=False, cache=False):
+        """
+        :param stream: 为 True 时仅读取响应头，响应体由调用方按需读取（需自行关闭响应）
+        :param cache: 为 True 时对 GET 请求使用条件请求缓存，仅用于只读页面，不能与 stream 同时使用
+        :param timeout: 超时秒数或 (连接超时, 读取超时)，为空时使用按域名学习的超时
+        """
+        if cache and method.upper() == "GET" and not stream:
+            return cls._cached_get(url, headers=headers, params=params, timeout=timeout, encoding=encoding)
+        adaptive = timeout is None
+        if adaptive:
+            timeout = cls.timeouts.timeout(url)
+        cls.rate_limiter.acquire(url)
+        started = time.perf_counter()
+        try:
+            with RequestTiming.request(method, url, stream=stream) as span:
+                response = cls.transport.request(method, url, headers=headers, params=params, data=data,
+                                                 timeout=timeout, stream=stream)
+        except Exception as e:
+            Metrics.observe_http(method, url, "error", time.perf_counter() - started)
+            # 仅在使用学习到的超时时记录超时，调用方显式指定的超时不代表站点的实际耗时
+            if adaptive and isinstance(e, CONNECT_TIMEOUT_ERRORS + READ_TIMEOUT_ERRORS):
+                cls.timeouts.observe_timeout(url, timeout, connect=isinstance(e, CONNECT_TIMEOUT_ERRORS))
+            raise
+        elapsed = time.perf_counter() - started
+        Metrics.observe_http(method, url, response.status_code, elapsed)
+        if span is not None:
+            cls.timeouts.observe(url, connect=span["connect"], read=span["ttfb"])
+        else:
+            cls.timeouts.observe(url, read=elapsed)
+        RequestTiming.bind(response, span)
+        return apply_encoding(response, encoding)
+
+    @classmethod
+    def _cached_get(cls, url, headers=None, params=None, timeout=None, encoding=None):
+        key = cls.response_cache.key(url, params=params, headers=headers)
+        validators = cls.response_cache.validators(key)
+        response = cls.request("GET", url, headers={**(headers or {}), **validators}, params=params,
+                               timeout=timeout, encoding=encoding)
+        if response.status_code == 304 and validators:
+            cached = cls.response_cache.revalidated(key, response)
+            if cached is not None:
+                RequestTiming.rebind(response, cached)
+                return cached
+            # 缓存已被淘汰，重新获取完整页面
+            response = cls.request("GET", url, headers=headers, params=params, timeout=timeout, encoding=encoding)
+        cls.response_cache.store(key, response)
         return response
+
+    @classmethod
+    def get(cls, url, headers=None, params=None, timeout=None, encoding=None, stream=False,
+            cache=False):
+        return cls.request("GET", url, headers=headers, params=params, timeout=timeout, encoding=encoding,
+                           stream=stream, cache=cache)
+
+    @classmethod
+    def post(cls, url, headers=None, data=None, timeout=None, encoding=None):
+        return cls.request("POST", url, headers=headers, data=data, timeout=timeout, encoding=encoding)
+
+    @classmethod
+    def put(cls, url, headers=None, data=None, timeout=None):
+        return cls.request("PUT", url, headers=headers, data=data, timeout=timeout)
+
+    @classmethod
+    def delete(cls, url, headers=None, data=None, timeout=None):
+        return cls.request("DELETE", url, headers=headers, data=data, timeout=timeout)
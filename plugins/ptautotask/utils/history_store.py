@@ -0,0 +1,232 @@
+from datetime import datetime, tzinfo
+from typing import Callable, List, Optional
+
+
+class HistoryStore:
+    """
+    按运行分段保存的执行历史。
+    每次运行单独保存为一个数据项，另维护一份按时间戳排序、分块保存的轻量索引；
+    追加只写入新运行、最后一个索引分块与分块清单，清理时按时间戳整段删除过期运行，无需解析历史内容。
+    """
+    # 索引按时间分块保存，清单中只记录各分块的摘要，追加时只改写最后一个分块
+    INDEX_KEY = "history_index"
+    INDEX_CHUNK_PREFIX = "history_index_"
+    INDEX_CHUNK_SIZE = 50
+    RUN_KEY_PREFIX = "history_run_"
+    # 累计统计：{"total": {...}, "sites": {站点: {...}}, "tasks": {任务id: {...}}}，每项为 {"success": n, "fail": n}
+    STATS_KEY = "history_stats"
+    # 旧版本将全部历史保存在同一个 key 中
+    LEGACY_KEY = "history"
+
+    def __init__(self, get_data: Callable, save_data: Callable, del_data: Callable, tz: tzinfo = None):
+        """
+        :param tz: 运行时间（date 字段）所在的时区，迁移旧版历史时用于换算时间戳，为空时使用系统时区
+        """
+        self._get_data = get_data
+        self._save_data = save_data
+        self._del_data = del_data
+        self._tz = tz
+
+    @staticmethod
+    def is_failed(record: dict) -> bool:
+        """
+        判断单条任务记录是否失败，优先使用执行时写入的 failed 标记，旧记录回退到状态文本判断
+        """
+        if "failed" in record:
+            return bool(record["failed"])
+        status = record.get("status")
+        if not status:
+            return False
+        return ("失败" in status) or ("异常" in status) or ("error" in status.lower())
+
+    def _load_manifest(self) -> dict:
+        """
+        读取索引清单 {"chunks": [{"key", "count", "first_ts", "last_ts"}, ...], "next": 下一个分块序号}，
+        分块按时间升序；旧版本的单一列表索引与整块历史在此迁移
+        """
+        manifest = self._get_data(self.INDEX_KEY)
+        if isinstance(manifest, dict):
+            return manifest
+        if manifest is None:
+            entries = self._migrate_legacy()
+        else:
+            entries = manifest
+        manifest = {"chunks": [], "next": 0}
+        for start in range(0, len(entries), self.INDEX_CHUNK_SIZE):
+            self._save_chunk(manifest, None, entries[start:start + self.INDEX_CHUNK_SIZE])
+        self._save_data(key=self.INDEX_KEY, value=manifest)
+        return manifest
+
+    def _save_chunk(self, manifest: dict, chunk: Optional[dict], entries: List[dict]):
+        """
+        保存一个索引分块并更新清单中的摘要，chunk 为 None 时新建分块
+        """
+        if chunk is None:
+            chunk = {"key": f"{self.INDEX_CHUNK_PREFIX}{manifest['next']}"}
+            manifest["next"] += 1
+            manifest["chunks"].append(chunk)
+        chunk.update(count=len(entries), first_ts=entries[0]["ts"], last_ts=entries[-1]["ts"])
+        self._save_data(key=chunk["key"], value=entries)
+
+    def _load_chunk(self, chunk: dict) -> List[dict]:
+        """
+        读取索引分块，索引项为 {"ts": 时间戳, "key": 数据项 key, "date": 运行时间, "success": n, "fail": n}，按 ts 升序
+        """
+        return self._get_data(chunk["key"]) or []
+
+    def _timestamp(self, date: str) -> int:
+        """
+        将 date 字段（本地时间字符串）换算为时间戳，与新运行使用的时区一致
+        """
+        value = datetime.strptime(date, '%Y-%m-%d %H:%M:%S')
+        if self._tz is not None:
+            # pytz 时区需通过 localize 确定夏令时偏移，直接替换 tzinfo 会得到错误的偏移
+            value = self._tz.localize(value) if hasattr(self._tz, "localize") else value.replace(tzinfo=self._tz)
+        return int(value.timestamp())
+
+    def _migrate_legacy(self) -> List[dict]:
+        """
+        将旧版整块保存的历史拆分为按运行保存的数据项，返回索引项
+        """
+        legacy = self._get_data(self.LEGACY_KEY) or []
+        index = []
+        for run in legacy:
+            try:
+                ts = self._timestamp(run.get("date"))
+            except (TypeError, ValueError):
+                continue
+            # 同一秒内的多次运行顺延时间戳，保证 key 唯一
+            used = {item["ts"] for item in index}
+            while ts in used:
+                ts += 1
+            index.append(self._write_run(run, ts))
+        index.sort(key=lambda item: item["ts"])
+        if legacy:
+            self._del_data(self.LEGACY_KEY)
+        return index
+
+    def _write_run(self, run_entry: dict, ts: int) -> dict:
+        key = f"{self.RUN_KEY_PREFIX}{ts}"
+        self._save_data(key=key, value=run_entry)
+        records = run_entry.get("records") or []
+        fail = sum(1 for record in records if self.is_failed(record))
+        return {"ts": ts, "key": key, "date": run_entry.get("date"), "success": len(records) - fail, "fail": fail}
+
+    @staticmethod
+    def _new_stats() -> dict:
+        return {"total": {"success": 0, "fail": 0}, "sites": {}, "tasks": {}}
+
+    def _apply_stats(self, stats: dict, records: list, sign: int = 1):
+        """
+        将一次运行的记录计入（sign=1）或移出（sign=-1）累计统计
+        """
+        for record in records or []:
+            field = "fail" if self.is_failed(record) else "success"
+            site = record.get("site") or record.get("domain") or "未知站点"
+            buckets = [
+                stats["total"],
+                stats["sites"].setdefault(site, {"success": 0, "fail": 0}),
+                stats["tasks"].setdefault(record.get("task_id") or "", {"success": 0, "fail": 0})
+            ]
+            for bucket in buckets:
+                bucket[field] = max(bucket[field] + sign, 0)
+
+    def _load_stats(self) -> dict:
+        stats = self._get_data(self.STATS_KEY)
+        if stats is None:
+            # 首次使用（或从旧版本升级）时根据已有历史重建一次
+            stats = self._new_stats()
+            for run in self.list_runs():
+                self._apply_stats(stats, run.get("records"))
+            self._save_data(key=self.STATS_KEY, value=stats)
+        return stats
+
+    def stats(self) -> dict:
+        """
+        获取累计统计
+        """
+        return self._load_stats()
+
+    def latest(self) -> Optional[dict]:
+        """
+        获取最近一次运行的索引项（含成功/失败数），无记录时返回 None
+        """
+        chunks = self._load_manifest()["chunks"]
+        entries = self._load_chunk(chunks[-1]) if chunks else []
+        return entries[-1] if entries else None
+
+    def append(self, run_entry: dict, ts: int):
+        """
+        追加一次运行记录，只写入该运行、最后一个索引分块与清单
+        :param run_entry: {'date': '...', 'records': [...]}
+        :param ts: 运行时间戳（秒）
+        """
+        manifest = self._load_manifest()
+        stats = self._load_stats()
+        chunks = manifest["chunks"]
+        last = chunks[-1] if chunks else None
+        # 时间戳保持递增：同一秒内（或时钟回拨后）的运行顺延，保证 key 唯一
+        if last is not None and ts <= last["last_ts"]:
+            ts = last["last_ts"] + 1
+        entry = self._write_run(run_entry, ts)
+        if last is not None and last["count"] < self.INDEX_CHUNK_SIZE:
+            self._save_chunk(manifest, last, self._load_chunk(last) + [entry])
+        else:
+            self._save_chunk(manifest, None, [entry])
+        self._save_data(key=self.INDEX_KEY, value=manifest)
+        self._apply_stats(stats, run_entry.get("records"))
+        self._save_data(key=self.STATS_KEY, value=stats)
+
+    def prune(self, cutoff_ts: float):
+        """
+        删除时间戳早于 cutoff_ts 的运行记录，只读取包含过期运行的分块
+        """
+        manifest = self._load_manifest()
+        expired_chunks = [chunk for chunk in manifest["chunks"] if chunk["first_ts"] < cutoff_ts]
+        if not expired_chunks:
+            return
+        stats = self._load_stats()
+        for chunk in expired_chunks:
+            entries = self._load_chunk(chunk)
+            for item in entries:
+                if item["ts"] >= cutoff_ts:
+                    continue
+                run = self._get_data(item["key"])
+                if run is not None:
+                    self._apply_stats(stats, run.get("records"), sign=-1)
+                self._del_data(item["key"])
+            kept = [item for item in entries if item["ts"] >= cutoff_ts]
+            if kept:
+                self._save_chunk(manifest, chunk, kept)
+            else:
+                manifest["chunks"].remove(chunk)
+                self._del_data(chunk["key"])
+        self._save_data(key=self.INDEX_KEY, value=manifest)
+        self._save_data(key=self.STATS_KEY, value=stats)
+
+    def count(self) -> int:
+        return sum(chunk["count"] for chunk in self._load_manifest()["chunks"])
+
+    def list_runs(self, offset: int = 0, limit: Optional[int] = None) -> List[dict]:
+        """
+        按时间倒序读取运行记录，只读取覆盖所需范围的索引分块
+        """
+        selected = []
+        skip = offset
+        for chunk in reversed(self._load_manifest()["chunks"]):
+            if limit is not None and len(selected) >= limit:
+                break
+            if skip >= chunk["count"]:
+                skip -= chunk["count"]
+                continue
+            entries = self._load_chunk(chunk)[::-1][skip:]
+            skip = 0
+            selected.extend(entries)
+        if limit is not None:
+            selected = selected[:limit]
+        runs = []
+        for item in selected:
+            run = self._get_data(item["key"])
+            if run is not None:
+                runs.append(run)
+        return runs
@@ -0,0 +1,102 @@
+import hashlib
+import threading
+from datetime import datetime
+from http.cookies import CookieError, SimpleCookie
+from typing import Callable, Optional, Union
+
+
+class CompletionLedger:
+    """
+    任务完成台账：记录每个（站点, 账号, 任务）最近一次成功所在的周期，
+    同一周期内再次运行时直接跳过，不发起任何网络请求；更换账号（cookie）后按新账号重新计算。
+    数据格式为 {"域名|任务id|账号": 周期标识}，每个任务只保留最近一次成功的账号与周期。
+    """
+    DATA_KEY = "completion_ledger"
+
+    def __init__(self, get_data: Callable, save_data: Callable):
+        self._get_data = get_data
+        self._save_data = save_data
+        self._entries = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def period_key(period: Union[str, int, None], now: datetime) -> Optional[str]:
+        """
+        计算 now 所在周期的标识
+        :param period: "daily"（每天）、"weekly"（每周，周一开始）、整数 N（当天按 N 小时划分的时间窗），
+                       None 表示不限制执行次数
+        :param now: 带时区的当前时间，周期按该时区的自然日划分
+        """
+        if period is None:
+            return None
+        if period == "daily":
+            return now.strftime("%Y-%m-%d")
+        if period == "weekly":
+            year, week, _ = now.isocalendar()
+            return f"{year}-W{week:02d}"
+        if isinstance(period, int) and period > 0:
+            return f"{now.strftime('%Y-%m-%d')}#{now.hour // period}"
+        raise ValueError(f"不支持的任务周期: {period}")
+
+    @staticmethod
+    def account(cookie: Optional[str]) -> str:
+        """
+        账号标识：优先使用 NexusPHP 的 c_secure_uid cookie（刷新 cookie 后不变），否则使用 cookie 摘要
+        """
+        if not cookie:
+            return ""
+        parsed = SimpleCookie()
+        try:
+            parsed.load(cookie)
+        except CookieError:
+            pass
+        uid = parsed.get("c_secure_uid")
+        if uid is not None and uid.value:
+            return f"uid:{uid.value}"
+        return hashlib.sha1(cookie.encode("utf-8")).hexdigest()[:16]
+
+    @classmethod
+    def _key(cls, domain: str, task_id: str, cookie: Optional[str]) -> str:
+        return f"{domain}|{task_id}|{cls.account(cookie)}"
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            self._entries = self._get_data(self.DATA_KEY) or {}
+        return self._entries
+
+    def is_done(self, domain: str, task_id: str, period, now: datetime, cookie: str = None) -> bool:
+        """
+        判断任务在当前周期内是否已由 cookie 对应的账号成功执行
+        """
+        current = self.period_key(period, now)
+        if current is None:
+            return False
+        with self._lock:
+            return self._load().get(self._key(domain, task_id, cookie)) == current
+
+    def mark_done(self, domain: str, task_id: str, period, now: datetime, cookie: str = None):
+        """
+        记录任务在当前周期内已由 cookie 对应的账号成功执行，需调用 flush 保存
+        """
+        current = self.period_key(period, now)
+        if current is None:
+            return
+        task_key = f"{domain}|{task_id}"
+        with self._lock:
+            entries = self._load()
+            # 同一任务只保留当前账号的记录（同时清理不含账号的旧格式记录）
+            for key in [key for key in entries if key == task_key or key.startswith(task_key + "|")]:
+                del entries[key]
+            entries[self._key(domain, task_id, cookie)] = current
+            self._dirty = True
+
+    def flush(self):
+        """
+        保存本次运行中的变更
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            self._save_data(key=self.DATA_KEY, value=self._entries)
+            self._dirty = False
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import List, Optional
+
+
+class SiteManifest:
+    """
+    站点/任务清单缓存。
+    记录 sites 与 base 目录下源文件的修改时间与哈希，源文件未变化时直接读取清单，无需导入站点模块。
+    """
+    MANIFEST_VERSION = 2
+    # 参与校验的源码目录（相对插件根目录）
+    SOURCE_DIRS = ("sites", "base")
+
+    def __init__(self, manifest_file: Path, plugin_path: Path):
+        self.manifest_file = Path(manifest_file)
+        self.plugin_path = Path(plugin_path)
+
+    def _source_files(self) -> List[Path]:
+        files = []
+        for source_dir in self.SOURCE_DIRS:
+            files.extend(sorted((self.plugin_path / source_dir).glob("*.py")))
+        return files
+
+    @staticmethod
+    def _file_hash(file: Path) -> str:
+        return hashlib.sha1(file.read_bytes()).hexdigest()
+
+    def _fingerprint(self, cached: dict = None) -> dict:
+        """
+        计算源文件指纹，修改时间未变化的文件复用缓存中的哈希
+        """
+        cached = cached or {}
+        fingerprint = {}
+        for file in self._source_files():
+            rel_path = file.relative_to(self.plugin_path).as_posix()
+            mtime = file.stat().st_mtime
+            cached_item = cached.get(rel_path)
+            if cached_item and cached_item.get("mtime") == mtime:
+                fingerprint[rel_path] = cached_item
+            else:
+                fingerprint[rel_path] = {"mtime": mtime, "sha1": self._file_hash(file)}
+        return fingerprint
+
+    def load(self) -> Optional[list]:
+        """
+        读取清单，源文件有增删或内容变化时返回 None
+        """
+        try:
+            manifest = json.loads(self.manifest_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if manifest.get("version") != self.MANIFEST_VERSION:
+            return None
+
+        cached = manifest.get("files") or {}
+        fingerprint = self._fingerprint(cached)
+        if fingerprint.keys() != cached.keys():
+            return None
+        if any(fingerprint[path]["sha1"] != cached[path].get("sha1") for path in fingerprint):
+            return None
+
+        sites = manifest.get("sites")
+        if fingerprint != cached:
+            # 仅修改时间变化（如重新拷贝文件），刷新清单中的修改时间
+            self._write(fingerprint, sites)
+        return sites
+
+    def save(self, sites: list):
+        """
+        保存站点清单
+        """
+        self._write(self._fingerprint(), sites)
+
+    def _write(self, fingerprint: dict, sites: list):
+        self.manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.manifest_file.with_suffix(".tmp")
+        tmp_file.write_text(json.dumps({
+            "version": self.MANIFEST_VERSION,
+            "files": fingerprint,
+            "sites": sites
+        }, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_file, self.manifest_file)
@@ -0,0 +1,180 @@
+import bisect
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}  # 标签值 -> 计数
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def collect(self) -> list:
+        with self._lock:
+            items = list(self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                     for labels, value in sorted(items))
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value: float, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def collect(self) -> list:
+        lines = super().collect()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class AgeGauge(Gauge):
+    """
+    记录事件发生的时间戳，导出时换算为距今的秒数
+    """
+
+    def timestamps(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def seed(self, *labelvalues, ts: float):
+        """
+        设置初始时间戳，已有更新的时间戳时保持不变
+        """
+        with self._lock:
+            if ts > self._values.get(labelvalues, 0):
+                self._values[labelvalues] = ts
+
+    def collect(self) -> list:
+        now = time.time()
+        with self._lock:
+            items = list(self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        lines.extend(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(round(now - ts, 3))}"
+                     for labels, ts in sorted(items))
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # 标签值 -> [各区间计数..., +Inf 区间计数, 总和]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def collect(self) -> list:
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(items):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Metrics:
+    """
+    进程内的运行指标，执行过程中直接累加计数，导出时按 Prometheus 文本格式输出。
+    计数仅保存在内存中，插件重启后重新计数；各任务最近一次成功的时间通过 last_success / seed_last_success
+    在插件数据中保存与恢复，重启后仍可据此告警。
+    """
+    LAST_SUCCESS_KEY = "task_last_success"
+    HTTP_REQUESTS = Counter("ptautotask_http_requests_total", "HTTP requests by domain, method and status code",
+                            ("domain", "method", "status"))
+    HTTP_DURATION = Histogram("ptautotask_http_request_duration_seconds",
+                              "HTTP request latency (until headers for streamed responses)", ("domain", "status"),
+                              buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+    RUN_DURATION = Histogram("ptautotask_run_duration_seconds", "Duration of a task run",
+                             buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800))
+    TASKS = Counter("ptautotask_task_runs_total", "Task executions by site, task and result",
+                    ("site", "task", "result"))
+    RETRIES = Counter("ptautotask_task_retries_total", "Retries scheduled for failed tasks", ("site", "task"))
+    LAST_SUCCESS = AgeGauge("ptautotask_task_last_success_age_seconds",
+                            "Seconds since the task last succeeded", ("site", "task"))
+    ALL = (HTTP_REQUESTS, HTTP_DURATION, RUN_DURATION, TASKS, RETRIES, LAST_SUCCESS)
+
+    @classmethod
+    def observe_http(cls, method: str, url: str, status, seconds: float):
+        domain = urlsplit(url).netloc
+        status = str(status)
+        cls.HTTP_REQUESTS.inc(domain, method.upper(), status)
+        cls.HTTP_DURATION.observe(seconds, domain, status)
+
+    @classmethod
+    def observe_task(cls, site: str, task: str, failed: bool):
+        cls.TASKS.inc(site, task, "failure" if failed else "success")
+        if not failed:
+            cls.LAST_SUCCESS.set(time.time(), site, task)
+
+    @classmethod
+    def observe_run(cls, seconds: float):
+        cls.RUN_DURATION.observe(seconds)
+
+    @classmethod
+    def observe_retry(cls, site: str, task: str):
+        cls.RETRIES.inc(site, task)
+
+    @classmethod
+    def last_success(cls) -> dict:
+        """
+        返回各任务最近一次成功的时间戳 {"域名|任务id": 时间戳}，用于保存
+        """
+        return {f"{site}|{task}": ts for (site, task), ts in cls.LAST_SUCCESS.timestamps().items()}
+
+    @classmethod
+    def seed_last_success(cls, data: dict):
+        """
+        载入保存的最近成功时间
+        :param data: {"域名|任务id": 时间戳}
+        """
+        for key, ts in (data or {}).items():
+            site, _, task = key.rpartition("|")
+            cls.LAST_SUCCESS.seed(site, task, ts=float(ts))
+
+    @classmethod
+    def render(cls) -> str:
+        lines = []
+        for metric in cls.ALL:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
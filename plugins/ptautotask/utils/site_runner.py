@@ -0,0 +1,242 @@
+import importlib
+import inspect
+import logging
+import threading
+import time
+from datetime import datetime, tzinfo
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+from .content_filter import ContentFilter
+from .history_store import HistoryStore
+from .ledger import CompletionLedger
+from .metrics import Metrics
+from .task_runner import SiteTaskRunner
+from .timing import RequestTiming
+
+# 插件包名（utils 的上一级），站点模块按清单中的相对路径从这里导入
+PLUGIN_PACKAGE = (__package__ or "ptautotask.utils").rsplit(".", 1)[0]
+
+
+class SiteRunner:
+    """
+    执行一次运行中各站点的任务：按域名分组交给 SiteTaskRunner 并发执行，同一域名内保持任务顺序。
+    单个任务依次经过完成台账检查、请求耗时采集、结果判断与台账记录，插件与基准测试共用此流程。
+    站点格式与站点清单一致：{"name", "domain", "cookie", "tasks": [{"id", "module", "method", "class", ...}]}
+    """
+
+    def __init__(self, ledger: CompletionLedger, is_enabled: Callable[[str], bool], tz: tzinfo = None,
+                 max_workers: int = 4, logger: logging.Logger = None, force: bool = False):
+        """
+        :param ledger: 完成台账，本周期内已完成的任务直接跳过
+        :param is_enabled: 传入任务 id，返回该任务是否启用
+        :param tz: 任务记录与周期计算使用的时区
+        :param logger: 日志记录器，为空时使用本模块的 logger
+        :param force: 为 True 时忽略完成台账执行全部任务（手动运行），成功的任务仍会记录到台账
+        """
+        self.ledger = ledger
+        self.force = force
+        self.is_enabled = is_enabled
+        self.tz = tz
+        self.max_workers = max_workers
+        self.logger = logger or logging.getLogger(__name__)
+        self.runner = None
+        # 本次运行内的任务实例缓存，key 为 (任务类, 站点域名, cookie)，运行结束后释放
+        self._instances: Dict[tuple, Any] = {}
+        self._instances_lock = threading.Lock()
+
+    @staticmethod
+    def load_tasks_cls(module_path: str, class_name: str = "Tasks"):
+        """
+        按清单中的模块路径导入站点模块并返回任务类，仅在任务实际执行时调用
+        """
+        module = importlib.import_module(f"{PLUGIN_PACKAGE}.{module_path}")
+        return getattr(module, class_name, None)
+
+    @staticmethod
+    def convert_result_to_status(result) -> str:
+        if isinstance(result, str):
+            return result
+        if isinstance(result, dict):
+            return result.get("status") or result.get("message") or "执行完成"
+        if result is None:
+            return "执行完成"
+        return repr(result)
+
+    def _get_task_instance(self, tasks_cls, domain: str, cookie: Optional[str]):
+        key = (tasks_cls, domain, cookie)
+        with self._instances_lock:
+            instance = self._instances.get(key)
+            if instance is None:
+                # 尝试用 cookie 构造新实例
+                try:
+                    instance = tasks_cls(cookie=cookie)
+                except TypeError:
+                    instance = tasks_cls()
+                    if cookie is not None:
+                        setattr(instance, "cookie", cookie)
+                self._instances[key] = instance
+            return instance
+
+    def run_task(self, support_site: dict, task: dict):
+        """
+        执行单个任务并返回 (record, notify_line, failed_bool)
+        若任务被跳过返回 (None, None, None)
+        本函数为生成器：任务中 yield 的 Delay 会向上传递给执行器，需通过 yield from 调用
+        """
+        logger = self.logger
+        site_name = support_site.get("name") or support_site.get("domain") or "未知站点"
+        domain = support_site.get("domain") or ""
+        cookie = support_site.get("cookie")
+        task_id = task.get("id")
+        if not task_id:
+            logger.debug(f"任务无 id，跳过: {task}")
+            return None, None, None
+
+        if not self.is_enabled(task_id):
+            logger.debug(f"任务 {task_id} 被配置为禁用，跳过")
+            return None, None, None
+
+        module_path = task.get("module")
+        method_name = task.get("method")
+        if not module_path or not method_name:
+            logger.warning(f"任务 {task_id} 缺少模块或方法信息，跳过")
+            return None, None, None
+
+        now = datetime.now(tz=self.tz)
+        now_str = now.strftime('%Y-%m-%d %H:%M:%S')
+        # 本周期内已成功执行的任务直接跳过，不导入站点模块也不发起请求
+        period = task.get("period", "daily")
+        try:
+            done = self.ledger.is_done(domain, task_id, period, now, cookie=cookie)
+        except ValueError as e:
+            logger.warning(f"{site_name} - {task_id} {e}，不记录完成状态")
+            period, done = None, False
+        if done and not self.force:
+            logger.info(f"{site_name} - {task_id} 本周期内已完成，跳过")
+            return None, None, None
+
+        # 本任务发出的请求耗时，随任务记录一起保存
+        spans: List[dict] = []
+        task_started = time.perf_counter()
+        try:
+            # 执行任务
+            # 站点模块在任务首次执行时才导入
+            tasks_cls = self.load_tasks_cls(module_path, task.get("class") or "Tasks")
+            if not tasks_cls:
+                raise RuntimeError(f"在模块 {module_path} 中未找到任务类")
+            # 同一站点、同一 cookie 的任务在本次运行内共用一个实例（及其客户端与连接）
+            new_instance = self._get_task_instance(tasks_cls, domain, cookie)
+            method = getattr(new_instance, method_name, None)
+            if not method:
+                raise RuntimeError(f"在新实例中未找到方法 {method_name}")
+            logger.info(f"开始执行任务 {task_id}（站点: {site_name}）")
+            with RequestTiming.collect(spans):
+                result = method()
+
+            # 生成器任务：转发其中的延迟步骤，等待期间让出工作线程，最终 return 的值作为结果
+            if inspect.isgenerator(result):
+                result = yield from RequestTiming.trace(result, spans)
+
+            # 协程任务（async def 或返回协程的任务）交由本次运行共享的事件循环执行
+            if inspect.isawaitable(result):
+                result = self.runner.run_coroutine(RequestTiming.trace_async(result, spans))
+
+            status_text = self.convert_result_to_status(result)
+
+            record = {
+                "date": now_str,
+                "site": site_name,
+                "domain": domain,
+                "task_id": task_id,
+                "task_label": task.get("label"),
+                "status": status_text,
+                "timing": RequestTiming.summary(spans, time.perf_counter() - task_started),
+            }
+
+            # 记录中尚无 failed 标记，按状态文本判断，与历史统计使用同一规则
+            failed = HistoryStore.is_failed(record)
+            record["failed"] = failed
+            emoji = "❌" if failed else "✅"
+            line = f"{emoji} {task.get('label') or task_id}: {status_text}"
+
+            if failed:
+                logger.warning(f"{site_name} - {task_id} 返回失败: {status_text}")
+            elif not status_text.strip():
+                # 未解析到结果（如 Cookie 失效跳转到登录页）不能确认已完成，本周期内仍会再次执行
+                logger.warning(f"{site_name} - {task_id} 未返回结果，不记录为本周期已完成")
+            else:
+                logger.info(f"{site_name} - {task_id} 执行成功: {status_text}")
+                self.ledger.mark_done(domain, task_id, period, now, cookie=cookie)
+
+            return record, line, failed
+
+        except Exception as e:
+            # 捕获执行期异常，构造失败记录
+            logger.error(f"{site_name} - {task.get('id')} 异常: {e}", exc_info=True)
+            err_status = f"执行失败: {str(e)}"
+            record = {
+                "date": now_str,
+                "site": site_name,
+                "domain": domain,
+                "task_id": task.get("id"),
+                "task_label": task.get("label"),
+                "status": err_status,
+                "failed": True,
+                "timing": RequestTiming.summary(spans, time.perf_counter() - task_started),
+            }
+            line = f"❌ {task.get('label') or task.get('id')}: {err_status}"
+            return record, line, True
+
+    def run_domain(self, sites: List[dict], site_indexes: List[int], target_set: Optional[set] = None):
+        """
+        顺序执行同一域名下所有站点的任务，返回 {站点序号: [(record, notify_line, failed_bool)]}
+        本函数为生成器，由执行器驱动
+        """
+        domain_results = {}
+        for idx in site_indexes:
+            site_results = []
+            for task in sites[idx].get("tasks") or []:
+                target = (sites[idx].get("domain"), task.get("id"))
+                if target_set is not None and target not in target_set:
+                    continue
+                try:
+                    rec, line, failed = yield from self.run_task(sites[idx], task)
+                except Exception as e:
+                    self.logger.error(f"执行任务 {task.get('id')} 时发生未处理异常: {e}", exc_info=True)
+                    continue
+                if rec is not None:
+                    site_results.append((rec, line, failed))
+            domain_results[idx] = site_results
+        return domain_results
+
+    def run(self, sites: List[dict], target_set: Optional[set] = None) -> List[tuple]:
+        """
+        执行全部站点的任务，结束后释放任务实例与解析缓存并保存完成台账
+        :param target_set: 仅执行指定的 {(域名, 任务id)}，为空时执行全部已启用任务
+        :return: 按站点原有顺序排列的 [(record, notify_line, failed_bool)]
+        """
+        # 按域名分组：不同域名并发执行，同一域名内保持任务顺序
+        domain_groups: Dict[str, List[int]] = {}
+        for idx, support_site in enumerate(sites):
+            domain_groups.setdefault(support_site.get("domain") or "", []).append(idx)
+
+        site_results_map: Dict[int, list] = {}
+        self.runner = SiteTaskRunner(max_workers=self.max_workers)
+        try:
+            for domain_results in self.runner.run([partial(self.run_domain, sites, indexes, target_set)
+                                                   for indexes in domain_groups.values()]):
+                site_results_map.update(domain_results)
+        finally:
+            self.runner.close()
+            self._instances.clear()
+            ContentFilter.clear_cache()
+            self.ledger.flush()
+
+        # 按站点原有顺序合并执行结果，保证历史与通知顺序稳定
+        results = []
+        for idx in range(len(sites)):
+            for rec, line, failed in site_results_map.get(idx, []):
+                Metrics.observe_task(rec.get("domain") or "", rec.get("task_id"), failed)
+                results.append((rec, line, failed))
+        return results
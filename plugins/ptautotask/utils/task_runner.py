@@ -0,0 +1,130 @@
+import asyncio
+import heapq
+import inspect
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+
+from .async_requests import AsyncCustomRequests
+
+
+class EventLoopThread:
+    """
+    在后台线程中运行的事件循环，首次提交协程时才启动
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def started(self) -> bool:
+        return self._loop is not None
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="ptautotask-loop", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def run(self, coro):
+        """
+        将协程提交到事件循环并阻塞等待其结果
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_started()).result()
+
+    def stop(self):
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+class SiteTaskRunner:
+    """
+    站点任务执行器：不同站点（域名）之间并发执行，同一站点内的任务保持原有顺序。
+    一次运行内的所有协程任务共享同一个事件循环。
+    站点任务可以是生成器：yield Delay(秒数) 时让出工作线程，到期后再继续执行。
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max(1, int(max_workers or 1))
+        self._event_loop = EventLoopThread()
+
+    @staticmethod
+    def _start(job):
+        """
+        启动站点任务，返回 (generator, 延迟或结果)；普通函数直接返回 (None, 结果)
+        """
+        result = job()
+        if inspect.isgenerator(result):
+            return SiteTaskRunner._advance(result)
+        return None, result
+
+    @staticmethod
+    def _advance(generator):
+        """
+        继续执行生成器直到下一个延迟步骤，返回 (generator, 延迟)；执行结束时返回 (None, 结果)
+        """
+        try:
+            return generator, next(generator)
+        except StopIteration as stop:
+            return None, stop.value
+
+    def run(self, jobs: list) -> list:
+        """
+        并发执行各站点的任务
+        :param jobs: 可调用对象列表，每项负责按顺序执行一个域名下的全部任务，可以返回生成器
+        :return: 与 jobs 顺序一致的执行结果列表
+        """
+        if not jobs:
+            return []
+        results = [None] * len(jobs)
+        workers = min(self.max_workers, len(jobs))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ptautotask") as executor:
+            pending = {executor.submit(self._start, job): index for index, job in enumerate(jobs)}
+            timers = []  # (唤醒时间, 序号, 站点序号, 生成器)
+            seq = 0
+            while pending or timers:
+                timeout = max(0.0, timers[0][0] - time.monotonic()) if timers else None
+                if pending:
+                    done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+                else:
+                    # 所有站点都在等待延迟，wait 对空集合会立即返回，需自行休眠到最近的唤醒时间
+                    time.sleep(timeout)
+                    done = ()
+                for future in done:
+                    index = pending.pop(future)
+                    generator, value = future.result()
+                    if generator is None:
+                        results[index] = value
+                        continue
+                    seq += 1
+                    heapq.heappush(timers, (time.monotonic() + getattr(value, "seconds", 0), seq, index, generator))
+                # 唤醒到期的站点任务
+                while timers and timers[0][0] <= time.monotonic():
+                    _, _, index, generator = heapq.heappop(timers)
+                    pending[executor.submit(partial(self._advance, generator))] = index
+        return results
+
+    def run_coroutine(self, coro):
+        """
+        在共享事件循环中执行协程任务，阻塞当前工作线程直至完成
+        """
+        return self._event_loop.run(coro)
+
+    def close(self):
+        """
+        释放本次运行使用的异步客户端与事件循环
+        """
+        if self._event_loop.started:
+            self._event_loop.run(AsyncCustomRequests.aclose())
+        self._event_loop.stop()
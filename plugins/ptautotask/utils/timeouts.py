@@ -0,0 +1,110 @@
+import threading
+from collections import deque
+from urllib.parse import urlsplit
+
+from .config import Config
+from .timing import percentile
+
+
+class AdaptiveTimeouts:
+    """
+    按域名学习请求超时：分别记录建立连接与等待响应（首字节）的耗时，
+    取最近 Config.TIMEOUT_SAMPLES 个样本的百分位数乘以 Config.TIMEOUT_MULTIPLIER 作为超时，
+    并限制在 Config 的下限与上限之间。样本不足时使用 Config.REQUEST_TIMEOUT。
+    Config.TIMEOUT_HEAVY_PATHS 中的耗时较长的接口（抽奖、打怪等）单独统计，使用独立的上下限。
+    样本通过 dump / load 在多次运行之间保存，数据格式为 {"域名" 或 "域名/路径": {"connect": [...], "read": [...]}}。
+    """
+    DATA_KEY = "adaptive_timeouts"
+
+    def __init__(self):
+        self._samples = {}  # key -> {"connect": deque, "read": deque}
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(url: str) -> tuple:
+        """
+        返回 (统计 key, 是否为耗时较长的接口)
+        """
+        parts = urlsplit(url)
+        if parts.path in Config.TIMEOUT_HEAVY_PATHS:
+            return parts.netloc + parts.path, True
+        return parts.netloc, False
+
+    @staticmethod
+    def _bound(samples, floor: float, ceiling: float, default: float) -> float:
+        if len(samples) < Config.TIMEOUT_MIN_SAMPLES:
+            value = default
+        else:
+            value = percentile(list(samples), Config.TIMEOUT_PERCENTILE) * Config.TIMEOUT_MULTIPLIER
+        return round(min(max(value, floor), ceiling), 3)
+
+    def timeout(self, url: str) -> tuple:
+        """
+        返回 url 对应的 (连接超时, 读取超时) 秒数
+        """
+        key, heavy = self._key(url)
+        with self._lock:
+            entry = self._samples.get(key) or {}
+            connect_samples = list(entry.get("connect") or ())
+            read_samples = list(entry.get("read") or ())
+        connect = self._bound(connect_samples, Config.TIMEOUT_CONNECT_FLOOR, Config.TIMEOUT_CONNECT_CEILING,
+                              Config.REQUEST_TIMEOUT)
+        if heavy:
+            read = self._bound(read_samples, Config.TIMEOUT_HEAVY_READ_FLOOR, Config.TIMEOUT_HEAVY_READ_CEILING,
+                               Config.TIMEOUT_HEAVY_READ_FLOOR)
+        else:
+            read = self._bound(read_samples, Config.TIMEOUT_READ_FLOOR, Config.TIMEOUT_READ_CEILING,
+                               Config.REQUEST_TIMEOUT)
+        return connect, read
+
+    def observe(self, url: str, connect: float = None, read: float = None):
+        """
+        记录一次请求的耗时；复用连接时没有建立连接的耗时，connect 传 None 或 0 即可
+        """
+        key, _ = self._key(url)
+        with self._lock:
+            entry = self._samples.get(key)
+            if entry is None:
+                entry = self._samples[key] = {"connect": deque(maxlen=Config.TIMEOUT_SAMPLES),
+                                              "read": deque(maxlen=Config.TIMEOUT_SAMPLES)}
+            if connect:
+                entry["connect"].append(round(connect, 3))
+            if read is not None:
+                entry["read"].append(round(read, 3))
+            self._dirty = True
+
+    def observe_timeout(self, url: str, timeout, connect: bool):
+        """
+        记录一次超时：以本次使用的超时时间作为样本，之后的超时随之逐步放宽（不超过上限）
+        :param timeout: 本次请求的超时，(连接超时, 读取超时) 或单个秒数
+        :param connect: 是否为建立连接超时
+        """
+        connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        if connect:
+            self.observe(url, connect=connect_timeout)
+        else:
+            self.observe(url, read=read_timeout)
+
+    def load(self, data: dict):
+        """
+        载入之前保存的样本
+        """
+        with self._lock:
+            self._samples = {
+                key: {field: deque((values or {}).get(field) or (), maxlen=Config.TIMEOUT_SAMPLES)
+                      for field in ("connect", "read")}
+                for key, values in (data or {}).items()
+            }
+            self._dirty = False
+
+    def dump(self):
+        """
+        返回需要保存的样本，自上次 load / dump 以来没有新样本时返回 None
+        """
+        with self._lock:
+            if not self._dirty:
+                return None
+            self._dirty = False
+            return {key: {field: list(values) for field, values in entry.items()}
+                    for key, entry in self._samples.items()}
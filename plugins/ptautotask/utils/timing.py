@@ -0,0 +1,171 @@
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import urlsplit
+
+
+def percentile(values: list, pct: float) -> float:
+    """
+    计算百分位数（最近秩），values 为空时返回 0
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class _ActiveRequest:
+    __slots__ = ("span", "start", "connect_start", "headers")
+
+    def __init__(self, span: dict, start: float):
+        self.span = span
+        self.start = start
+        self.connect_start = None
+        self.headers = False
+
+
+class RequestTiming:
+    """
+    任务内 HTTP 请求的耗时统计。
+    执行任务时通过 collect 指定记录列表，期间 CustomRequests 发出的每个请求记录为一个 span：
+    {"method", "url", "status", "connect", "ttfb", "download", "parse", "total"}（秒）。
+    connect / ttfb 由传输层钩子写入，流式下载与解析耗时由 ContentFilter 按响应写入。
+    未在 collect 中执行时所有钩子均直接返回，不产生额外开销。
+    """
+    FIELDS = ("connect", "ttfb", "download", "parse", "total")
+    # 当前任务的 span 列表；使用 ContextVar 以便生成器任务的各个步骤、协程任务分别设置
+    _task_spans = ContextVar("ptautotask_task_spans", default=None)
+    # 正在发送的请求，供建立连接、收到响应头等底层钩子写入
+    _current = ContextVar("ptautotask_current_request", default=None)
+    # 响应 -> span，用于将之后的下载、解析耗时计入对应请求
+    _response_spans = weakref.WeakKeyDictionary()
+    _lock = threading.Lock()
+
+    @classmethod
+    @contextmanager
+    def collect(cls, spans: list):
+        token = cls._task_spans.set(spans)
+        try:
+            yield spans
+        finally:
+            cls._task_spans.reset(token)
+
+    @classmethod
+    def trace(cls, generator, spans: list):
+        """
+        逐步执行生成器任务，每一步都在 collect 中执行（各步骤可能在不同的工作线程中运行）
+        """
+        try:
+            while True:
+                with cls.collect(spans):
+                    step = next(generator)
+                yield step
+        except StopIteration as stop:
+            return stop.value
+
+    @classmethod
+    async def trace_async(cls, awaitable, spans: list):
+        """
+        在协程任务中启用统计，协程在事件循环中拥有独立的上下文，设置不会影响其他任务
+        """
+        cls._task_spans.set(spans)
+        return await awaitable
+
+    @classmethod
+    @contextmanager
+    def request(cls, method: str, url: str, stream: bool = False):
+        """
+        统计一次请求，未在任务中执行时返回 None
+        :param stream: 流式请求的下载耗时由 ContentFilter 读取响应体时写入
+        """
+        spans = cls._task_spans.get()
+        if spans is None:
+            yield None
+            return
+        parts = urlsplit(url)
+        span = {"method": method.upper(), "url": parts.netloc + parts.path, "status": None,
+                **{field: 0.0 for field in cls.FIELDS}}
+        spans.append(span)
+        active = _ActiveRequest(span, time.perf_counter())
+        token = cls._current.set(active)
+        try:
+            yield span
+        except BaseException:
+            span["status"] = "error"
+            raise
+        finally:
+            cls._current.reset(token)
+            span["total"] = time.perf_counter() - active.start
+            if not active.headers:
+                span["ttfb"] = max(span["total"] - span["connect"], 0.0)
+            if not stream:
+                span["download"] = max(span["total"] - span["connect"] - span["ttfb"], 0.0)
+
+    @classmethod
+    def connect_started(cls):
+        active = cls._current.get()
+        if active is not None:
+            active.connect_start = time.perf_counter()
+
+    @classmethod
+    def connect_finished(cls):
+        active = cls._current.get()
+        if active is not None and active.connect_start is not None:
+            active.span["connect"] = time.perf_counter() - active.connect_start
+
+    @classmethod
+    def headers_received(cls):
+        active = cls._current.get()
+        if active is not None and not active.headers:
+            active.headers = True
+            active.span["ttfb"] = max(time.perf_counter() - active.start - active.span["connect"], 0.0)
+
+    @classmethod
+    def bind(cls, response, span: dict):
+        """
+        关联响应与 span，之后对该响应的下载、解析耗时计入该 span
+        """
+        if span is None:
+            return
+        span["status"] = getattr(response, "status_code", None)
+        with cls._lock:
+            cls._response_spans[response] = span
+
+    @classmethod
+    def rebind(cls, response, new_response):
+        """
+        条件请求命中缓存时，将缓存构造的响应关联到同一个 span
+        """
+        if not cls._response_spans:
+            return
+        with cls._lock:
+            span = cls._response_spans.get(response)
+            if span is not None:
+                cls._response_spans[new_response] = span
+
+    @classmethod
+    def add(cls, response, field: str, seconds: float):
+        """
+        将耗时计入响应对应的 span，下载耗时同时计入请求总耗时
+        """
+        if not cls._response_spans:
+            return
+        span = cls._response_spans.get(response)
+        if span is None:
+            return
+        span[field] += seconds
+        if field == "download":
+            span["total"] += seconds
+
+    @staticmethod
+    def summary(spans: list, total: float) -> dict:
+        """
+        生成写入任务记录的耗时摘要（毫秒）
+        """
+        return {
+            "total": round(total * 1000, 1),
+            "http": [{**span, **{field: round(span[field] * 1000, 1) for field in RequestTiming.FIELDS}}
+                     for span in spans]
+        }
@@ -0,0 +1,231 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.request import ACCEPT_ENCODING
+
+from .config import Config
+from .timing import RequestTiming
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401 httpx 的 HTTP/2 支持依赖 h2
+    HTTP2_AVAILABLE = httpx is not None
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# 区分连接超时与读取超时，用于调整按域名学习的超时时间
+CONNECT_TIMEOUT_ERRORS = (requests.exceptions.ConnectTimeout,) + ((httpx.ConnectTimeout,) if httpx else ())
+READ_TIMEOUT_ERRORS = (requests.exceptions.ReadTimeout,) + ((httpx.ReadTimeout,) if httpx else ())
+
+
+def httpx_timeout(timeout):
+    """
+    将 requests 风格的 (连接超时, 读取超时) 转换为 httpx.Timeout
+    """
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return timeout
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        RequestTiming.connect_started()
+        super().connect()
+        RequestTiming.connect_finished()
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        # 包含 TLS 握手
+        RequestTiming.connect_started()
+        super().connect()
+        RequestTiming.connect_finished()
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    新建连接时记录建立连接（含 TLS 握手）的耗时
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": TimedHTTPConnectionPool,
+                                                   "https": TimedHTTPSConnectionPool}
+
+
+def _on_response(response, *args, **kwargs):
+    # requests 在读取响应体之前触发 response 钩子
+    RequestTiming.headers_received()
+
+
+class SessionPool:
+    """
+    按域名复用的 requests.Session 池，保持长连接以避免每次请求都重新进行 TCP/TLS 握手
+    """
+
+    def __init__(self, pool_connections=Config.POOL_CONNECTIONS, pool_maxsize=Config.POOL_MAXSIZE,
+                 idle_timeout=Config.SESSION_IDLE_TIMEOUT):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.idle_timeout = idle_timeout
+        self._sessions = {}  # netloc -> [session, last_used]
+        self._lock = threading.Lock()
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        # 明确声明可解码的压缩格式（安装了 brotli / zstandard 时包含 br / zstd）
+        session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+        adapter = TimedHTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _evict_idle(self, now: float):
+        for netloc, (session, last_used) in list(self._sessions.items()):
+            if now - last_used > self.idle_timeout:
+                session.close()
+                del self._sessions[netloc]
+
+    def get(self, url: str) -> requests.Session:
+        """
+        获取 url 所属域名的会话，不存在时新建
+        """
+        netloc = urlparse(url).netloc
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._sessions.get(netloc)
+            if entry is None:
+                entry = [self._new_session(), now]
+                self._sessions[netloc] = entry
+            entry[1] = now
+            return entry[0]
+
+    def close(self):
+        """
+        关闭所有会话并释放连接
+        """
+        with self._lock:
+            for session, _ in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+class RequestsTransport:
+    """
+    基于 requests 的传输层（HTTP/1.1），按域名复用会话，支持流式读取
+    """
+    name = "requests"
+
+    def __init__(self, pool_connections=Config.POOL_CONNECTIONS, pool_maxsize=Config.POOL_MAXSIZE,
+                 idle_timeout=Config.SESSION_IDLE_TIMEOUT):
+        self.session_pool = SessionPool(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                        idle_timeout=idle_timeout)
+
+    def request(self, method, url, headers=None, params=None, data=None, timeout=Config.REQUEST_TIMEOUT,
+                stream=False):
+        session = self.session_pool.get(url)
+        return session.request(method, url, headers=headers, params=params, data=data, timeout=timeout,
+                               stream=stream, hooks={"response": _on_response})
+
+    def close(self):
+        self.session_pool.close()
+
+
+class HttpxTransport:
+    """
+    基于 httpx 的传输层，安装 h2 时使用 HTTP/2，同一站点的多次请求复用同一条多路复用连接；
+    压缩格式由 httpx 按已安装的解码器（gzip / brotli / zstd）协商。
+    返回的 httpx.Response 与 requests.Response 的常用属性（content、text、headers、encoding、status_code）一致，
+    流式读取仍交由 requests 传输层处理。
+    """
+    name = "httpx"
+
+    def __init__(self, pool_connections=Config.POOL_CONNECTIONS, pool_maxsize=Config.POOL_MAXSIZE,
+                 idle_timeout=Config.SESSION_IDLE_TIMEOUT, http2=HTTP2_AVAILABLE):
+        self.http2 = http2
+        self.pool_maxsize = pool_maxsize
+        self.idle_timeout = idle_timeout
+        self.fallback = RequestsTransport(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                          idle_timeout=idle_timeout)
+        self._clients = {}  # netloc -> httpx.Client
+        self._lock = threading.Lock()
+
+    def _get_client(self, url: str):
+        netloc = urlparse(url).netloc
+        with self._lock:
+            client = self._clients.get(netloc)
+            if client is None:
+                limits = httpx.Limits(max_connections=self.pool_maxsize,
+                                      max_keepalive_connections=self.pool_maxsize,
+                                      keepalive_expiry=self.idle_timeout)
+                client = httpx.Client(http2=self.http2, limits=limits, follow_redirects=True)
+                self._clients[netloc] = client
+            return client
+
+    @staticmethod
+    def _trace(event_name: str, info: dict):
+        """
+        httpx 的 trace 扩展回调，记录建立连接与收到响应头的时间
+        """
+        if event_name == "connection.connect_tcp.started":
+            RequestTiming.connect_started()
+        elif event_name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            RequestTiming.connect_finished()
+        elif event_name.endswith("receive_response_headers.complete"):
+            RequestTiming.headers_received()
+
+    def request(self, method, url, headers=None, params=None, data=None, timeout=Config.REQUEST_TIMEOUT,
+                stream=False):
+        if stream:
+            return self.fallback.request(method, url, headers=headers, params=params, data=data, timeout=timeout,
+                                         stream=True)
+        client = self._get_client(url)
+        timeout = httpx_timeout(timeout)
+        extensions = {"trace": self._trace}
+        # httpx 中字符串/字节形式的请求体需通过 content 传递
+        if isinstance(data, (str, bytes)):
+            return client.request(method, url, headers=headers, params=params, content=data, timeout=timeout,
+                                  extensions=extensions)
+        return client.request(method, url, headers=headers, params=params, data=data, timeout=timeout,
+                              extensions=extensions)
+
+    def close(self):
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
+        self.fallback.close()
+
+
+def create_transport(name: str = None, **kwargs):
+    """
+    按名称创建传输层，默认使用 requests；httpx 的表单编码、重定向与 Cookie 处理与 requests 不同，需显式选择
+    :param name: "requests"、"httpx" 或 "auto"（安装了 httpx 与 h2 时使用 HTTP/2，否则使用 requests），
+                 为空时使用 Config.HTTP_TRANSPORT
+    """
+    name = (name or Config.HTTP_TRANSPORT).lower()
+    if name == "auto":
+        name = "httpx" if HTTP2_AVAILABLE else "requests"
+    if name == "httpx" and httpx is not None:
+        return HttpxTransport(**kwargs)
+    return RequestsTransport(**kwargs)